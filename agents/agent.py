@@ -3,11 +3,10 @@ from dotenv import load_dotenv
 # import certifi
 # import httpx
 # import requests
-from utils import getAzureSTTModel,getAzureLLMModel,getAzureTTSModel
+from utils import getPrewarmedModels, getWorkerOptions, attach_session_metrics
 from urllib3.exceptions import InsecureRequestWarning
 from livekit import agents
 from livekit.agents import AgentSession, Agent, RoomInputOptions
-from livekit.plugins import silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 class Assistant(Agent):
@@ -26,18 +25,20 @@ class Assistant(Agent):
 async def entrypoint(ctx: agents.JobContext):
     print("into the entry point function...")
 
+    models = getPrewarmedModels(ctx.proc)
     session = AgentSession(
         # stt=openai.STT(model="gpt-4o-transcribe",client=client),
         # llm=openai.LLM(model="gpt-4o-mini",client=client),
         # tts = openai.TTS(model="gpt-4o-mini-tts",voice="ash",client=client,instructions="Speak in a friendly and conversational tone."),
-        stt=getAzureSTTModel(),
-        llm=getAzureLLMModel(),
-        tts=getAzureTTSModel(),
+        stt=models["stt"],
+        llm=models["llm"],
+        tts=models["tts"],
         # openai.TTS(model="gpt-4o-mini-tts",voice="ash",instructions="Speak in a friendly and conversational tone."),
 
-        vad=silero.VAD.load(),
+        vad=models["vad"],
         turn_detection=MultilingualModel(),
     )
+    attach_session_metrics(ctx, session)
     
     await session.start(
         room=ctx.room,
@@ -61,4 +62,4 @@ async def entrypoint(ctx: agents.JobContext):
 
 if __name__ == "__main__":
     print("Starting the agent...")
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint,agent_name="assistant-agent"))
\ No newline at end of file
+    agents.cli.run_app(getWorkerOptions(entrypoint, agent_name="assistant-agent"))
\ No newline at end of file
@@ -20,6 +20,65 @@ class Settings(BaseSettings):
     
     # Agent Settings
     AGENT_INSTRUCTIONS: str = "You are a helpful voice AI assistant."
+    # said when a session starts, played from the phrase audio cache once synthesized
+    AGENT_GREETING: str = "Hey, how can I help you today?"
+
+    # Retrieval Settings
+    CHROMA_PERSIST_DIR: str = "./chroma_db"
+    # Chroma server the ingestion API writes to; empty reads CHROMA_PERSIST_DIR in-process
+    CHROMA_HOST: str = ""
+    CHROMA_PORT: int = 8000
+    # collection shared by all users, written by the ingestion API
+    CHROMA_COLLECTION: str = "embedding_store"
+    INDEX_CACHE_MAX_ENTRIES: int = 32
+    INDEX_CACHE_TTL_SECONDS: float = 900.0
+    RETRIEVAL_CONTEXT_TOKEN_BUDGET: int = 1500
+    # chunks put in the LLM context per turn
+    RETRIEVAL_TOP_K: int = 3
+    # candidates from vector search and BM25 fused into RETRIEVAL_TOP_K by reciprocal rank
+    HYBRID_DENSE_TOP_K: int = 10
+    HYBRID_SPARSE_TOP_K: int = 10
+    HYBRID_RRF_K: int = 60
+    SPECULATIVE_RETRIEVAL_MIN_SIMILARITY: float = 0.85
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 2048
+    # SQLite file shared by all job processes on the worker; empty keeps the cache in memory only
+    QUERY_EMBEDDING_CACHE_PATH: str = "./query_embedding_cache.sqlite3"
+    # answers reused for questions this close (cosine) to an already answered one
+    ANSWER_CACHE_MIN_SIMILARITY: float = 0.95
+    ANSWER_CACHE_MIN_WORDS: int = 4
+    ANSWER_CACHE_MAX_ENTRIES_PER_PROJECT: int = 256
+    ANSWER_CACHE_TTL_SECONDS: float = 86400.0
+    # SQLite file shared by all job processes on the worker; empty keeps the cache in memory only
+    ANSWER_CACHE_PATH: str = "./answer_cache.sqlite3"
+
+    # TTS Settings
+    # synthesized audio of fixed phrases, shared by all workers on the host
+    PHRASE_CACHE_DIR: str = "./tts_phrase_cache"
+    PHRASE_CACHE_MAX_ENTRIES: int = 64
+    # flush the first clause to TTS early, then whole sentences; off uses the default segmentation
+    TTS_EARLY_FLUSH: bool = True
+    # first segment ends at a clause break once it has MIN words, or after MAX words
+    TTS_FIRST_CHUNK_MIN_WORDS: int = 3
+    TTS_FIRST_CHUNK_MAX_WORDS: int = 10
+    TTS_MIN_SENTENCE_CHARS: int = 20
+    # segments synthesized while an earlier one plays
+    TTS_SEGMENTS_AHEAD: int = 2
+
+    # Worker Settings
+    # sessions a worker takes before reporting full load
+    WORKER_MAX_SESSIONS: int = 8
+    # event loop lag that counts as full load
+    WORKER_MAX_LOOP_LAG_SECONDS: float = 0.5
+    # reported load at which the worker stops accepting jobs
+    WORKER_LOAD_THRESHOLD: float = 0.75
+    # prewarmed job processes kept ready for new sessions
+    WORKER_IDLE_PROCESSES: int = 2
+
+    # Metrics Settings
+    # Prometheus scrape port for per-turn latency histograms, 0 disables the endpoint
+    LATENCY_METRICS_PORT: int = 0
+    # where job processes write their samples for the scrape endpoint to merge
+    LATENCY_METRICS_DIR: str = "./prometheus_multiproc"
 
     class Config:
         env_file = ".env"
\ No newline at end of file
@@ -1,3 +1,6 @@
+import time
+import asyncio
+from typing import AsyncIterable, Optional
 from pathlib import Path
 from llama_index.core import (
     SimpleDirectoryReader,
@@ -5,29 +8,39 @@ from llama_index.core import (
     VectorStoreIndex,
     load_index_from_storage,
 )
-import chromadb
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core.schema import MetadataMode
 from llama_index.core import Settings
+from llama_index.core.base.base_retriever import BaseRetriever
 from livekit.agents import (
     Agent,
     AgentSession,
     AutoSubscribe,
     JobContext,
-    WorkerOptions,
     cli,
     llm,
 )
 from livekit.agents.voice.agent import ModelSettings
-from livekit.plugins import silero
 
 from utils import (
-    getAzureSTTModel,
-    getAzureLLMModel,
-    getAzureTTSModel,
+    getWorkerOptions,
+    getPrewarmedModels,
+    attach_session_metrics,
+    record_retrieval,
+    tenant_key,
+    tenant_filters,
+    project_from_metadata,
     getAzureLLMIndexModel, 
-    getAzureLLMIndexEmbeddingModel
+    getAzureLLMIndexEmbeddingModel,
+    index_cache,
+    RetrievalContextManager,
+    SpeculativeRetriever,
+    HybridRetriever,
+    answer_cache,
+    ScopedAnswerCache,
+    read_index_version,
+    say_phrase,
+    early_flush_tts_node,
 )
+from config import settings
 
 # # check if storage already exists
 # THIS_DIR = Path(__file__).parent
@@ -53,44 +66,64 @@ from utils import (
 #     index = load_index_from_storage(storage_context)
 
 def load_index_from_db_storage(participant_id: str):
-    """Get query engine for stored documents."""
+    """Get the (cached) vector index and BM25 index for the participant's stored documents."""
     try:
-        collection_name = "embedding_store"
-        collection_name = f"{collection_name}_{participant_id}"
-        chroma_client = chromadb.PersistentClient(path='./chroma_db')
-        # chroma_client = chromadb.Client(chromadb.config.Settings(
-        #                                 chroma_db_impl="duckdb+parquet",
-        #                                 persist_directory='./chroma_db'
-        #                         ))
-        collection = chroma_client.get_collection(collection_name)
-
-        # Set up vector store
-        vector_store = ChromaVectorStore(chroma_collection=collection)            
-        index = VectorStoreIndex.from_vector_store(
-            vector_store,
-            embed_model=getAzureLLMIndexEmbeddingModel()
-        )
-        return index
+        index, sparse_index = index_cache.get(tenant_key(participant_id))
+        print(f"index cache stats: {index_cache.stats()}")
+        return index, sparse_index
         
     except Exception as e:
         print(f"Error creating query engine: {e}")
         raise
 
+
+def build_retriever(participant_id: str, project_id: Optional[str]) -> BaseRetriever:
+    """
+    Retriever over the participant's project: vector search fused with BM25 when the
+    ingestion API has written a sparse index for the participant, vector search otherwise.
+    """
+    index, sparse_index = load_index_from_db_storage(participant_id=participant_id)
+    # the collection is shared, only this participant's project is searched
+    filters = tenant_filters(participant_id, project_id)
+    if sparse_index is None:
+        return index.as_retriever(filters=filters, similarity_top_k=settings.RETRIEVAL_TOP_K)
+    return HybridRetriever(
+        index.as_retriever(filters=filters, similarity_top_k=settings.HYBRID_DENSE_TOP_K),
+        sparse_index,
+        index.vector_store,
+        top_k=settings.RETRIEVAL_TOP_K,
+        sparse_top_k=settings.HYBRID_SPARSE_TOP_K,
+        rrf_k=settings.HYBRID_RRF_K,
+        project_id=project_id,
+    )
+
 class ReportRetrievalAgent(Agent):
-    def __init__(self, index: VectorStoreIndex):
+    def __init__(self, retriever: BaseRetriever, models: dict, answer_cache: ScopedAnswerCache):
         super().__init__(
             instructions=(
                 "You are a voice assistant. Your interface "
                 "with users will be voice. You should use short and concise "
                 "responses, and avoiding usage of unpronouncable punctuation." 
             ),
-            vad=silero.VAD.load(),
-            stt=getAzureSTTModel(),
-            llm=getAzureLLMModel(),
-            tts=getAzureTTSModel(),
+            vad=models["vad"],
+            stt=models["stt"],
+            llm=models["llm"],
+            tts=models["tts"],
+        )
+        self.speculative_retriever = SpeculativeRetriever(
+            retriever,
+            min_similarity=settings.SPECULATIVE_RETRIEVAL_MIN_SIMILARITY,
         )
-        self.index = index
+        self.context_manager = RetrievalContextManager(
+            token_budget=settings.RETRIEVAL_CONTEXT_TOKEN_BUDGET,
+            header="Context that might help answer the user's question. ",
+        )
+        self.answer_cache = answer_cache
         # self.job_ctx = job_ctx
+
+    async def on_enter(self):
+        # start retrieving from interim transcripts while the user is still speaking
+        self.speculative_retriever.attach(self.session)
     
     # async def on_enter(self):
     #     # The agent should be polite and greet the user when it joins :)
@@ -117,32 +150,38 @@ class ReportRetrievalAgent(Agent):
         # Explain the table briefly before presenting it.
         # """
         enhanced_query=user_query
-        retriever = self.index.as_retriever()
         print(f"RetrievalAgent: user query: {enhanced_query}")
-        nodes = await retriever.aretrieve(enhanced_query)
+        # a question already answered for this project goes straight to TTS,
+        # looked up while retrieval runs so a miss costs no extra latency
+        started = time.perf_counter()
+        retrieval = asyncio.create_task(self.speculative_retriever.retrieve(enhanced_query))
+        try:
+            cached_answer = await self.answer_cache.lookup(enhanced_query)
+        except BaseException:
+            retrieval.cancel()
+            raise
+        if cached_answer is not None:
+            retrieval.cancel()
+            return cached_answer
+        nodes = await retrieval
+        record_retrieval(self.session, time.perf_counter() - started)
 
         # print(f"RetrievalAgent: retrieved {len(nodes)} nodes for query: {enhanced_query}")
-        instructions = ("Context that might help answer the user's question. ")
-        for node in nodes:
-            node_content = node.get_content(metadata_mode=MetadataMode.LLM)
-            instructions += f"\n\n{node_content}"
-
-        # update the instructions for this turn, you may use some different methods
-        # to inject the context into the chat_ctx that fits the LLM you are using
-        system_msg = chat_ctx.items[0]
-        # print(f"RetrievalAgent: system message: {system_msg}")
-        if isinstance(system_msg, llm.ChatMessage) and system_msg.role == "system":
-            # TODO(long): provide an api to update the instructions of chat_ctx
-            system_msg.content.append(instructions)
-        else:
-            chat_ctx.items.insert(0, llm.ChatMessage(role="system", content=[instructions]))
-            safe_instructions = instructions.replace("\n", "\\n")
-            # print(f"update instructions: {safe_instructions}...")
+        # inject the context for this turn, replacing the previous turn's context
+        # so the system message stays within the token budget
+        self.context_manager.inject(chat_ctx, nodes)
 
         # update the instructions for agent
         # await self.update_instructions(instructions)
 
-        return Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        return self.answer_cache.record(
+            enhanced_query, Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        )
+
+    async def tts_node(self, text: AsyncIterable[str], model_settings: ModelSettings):
+        # RAG answers run long, start speaking at the first clause instead of the first sentence
+        async for frame in early_flush_tts_node(self, text, model_settings):
+            yield frame
 
 
 async def entrypoint(ctx: JobContext):
@@ -165,15 +204,24 @@ async def entrypoint(ctx: JobContext):
     #participatn metadata {"projectId":"proj_1749872575361_fbdgx94ql","projectName":"FinancialDocumentProject2"}
     # project_name = participant.metadata.get("projectName", "your project")
     # greeting = f" Hey, Looks like you need some help with {project_name}, how can I help you today?"
-    greeting = "Hey, how can I help you today?"
-    index = load_index_from_db_storage(participant_id=participant.identity)
-    agent = ReportRetrievalAgent(index)
+    greeting = settings.AGENT_GREETING
+    project_id = project_from_metadata(participant.metadata)
+    retriever = build_retriever(participant.identity, project_id)
+    key = tenant_key(participant.identity)
+    scoped_answer_cache = ScopedAnswerCache(
+        answer_cache,
+        scope=f"{key}/{project_id or ''}",
+        version_fn=lambda: read_index_version(key),
+        min_words=settings.ANSWER_CACHE_MIN_WORDS,
+    )
+    agent = ReportRetrievalAgent(retriever, getPrewarmedModels(ctx.proc), scoped_answer_cache)
     
     session = AgentSession()
+    attach_session_metrics(ctx, session)
     await session.start(agent=agent, room=ctx.room)
 
-    await session.say(greeting, allow_interruptions=True)
+    await say_phrase(session, agent.tts, greeting, allow_interruptions=True)
     
   
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint,agent_name="report-retrieval-agent"))
\ No newline at end of file
+    cli.run_app(getWorkerOptions(entrypoint, agent_name="report-retrieval-agent"))
\ No newline at end of file
@@ -1,3 +1,9 @@
+import sys
+import time
+import asyncio
+import json
+import hashlib
+from typing import AsyncIterable
 from pathlib import Path
 from llama_index.core import (
     SimpleDirectoryReader,
@@ -5,65 +11,174 @@ from llama_index.core import (
     VectorStoreIndex,
     load_index_from_storage,
 )
-from llama_index.core.schema import MetadataMode
 from llama_index.core import Settings
 from livekit.agents import (
     Agent,
     AgentSession,
     AutoSubscribe,
     JobContext,
-    WorkerOptions,
     cli,
     llm,
 )
 from livekit.agents.voice.agent import ModelSettings
-from livekit.plugins import silero
 
 from utils import (
-    getAzureSTTModel,
-    getAzureLLMModel,
-    getAzureTTSModel,
+    getWorkerOptions,
+    getPrewarmedModels,
+    getSharedIndexEmbeddingModel,
+    attach_session_metrics,
+    record_retrieval,
     getAzureLLMIndexModel, 
-    getAzureLLMIndexEmbeddingModel
+    getAzureLLMIndexEmbeddingModel,
+    RetrievalContextManager,
+    SpeculativeRetriever,
+    MmapVectorStore,
+    answer_cache,
+    ScopedAnswerCache,
+    say_phrase,
+    early_flush_tts_node,
 )
+from config import settings
 
-# check if storage already exists
 THIS_DIR = Path(__file__).parent
 PERSIST_DIR = THIS_DIR / "retrieval-engine-storage"
-if not PERSIST_DIR.exists():
-    # load the documents and create the index
-    documents = SimpleDirectoryReader(THIS_DIR / "./../data").load_data()
+DATA_DIR = THIS_DIR / "./../data"
+# data file -> content hash and the doc ids it produced, used to rebuild incrementally
+MANIFEST_PATH = PERSIST_DIR / "file_manifest.json"
+
+_index = None
+
+
+def file_content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_persisted_index() -> VectorStoreIndex:
+    storage_context = StorageContext.from_defaults(
+        persist_dir=PERSIST_DIR,
+        vector_store=MmapVectorStore.from_persist_dir(PERSIST_DIR)
+    )
+    return load_index_from_storage(storage_context)
+
+
+def build_index() -> VectorStoreIndex:
+    """
+    Build or update the persisted index from the data folder.
+    Only files whose content hash changed since the last build are re-embedded.
+    """
+    # checked before anything is deleted, a missing or empty data folder would otherwise
+    # wipe the persisted index
+    if not DATA_DIR.is_dir():
+        raise RuntimeError(f"Data folder {DATA_DIR} does not exist, nothing to index.")
+    data_files = {
+        str(path.relative_to(DATA_DIR)): path
+        for path in sorted(DATA_DIR.rglob("*"))
+        if path.is_file() and not path.name.startswith(".")
+    }
+    if not data_files:
+        raise RuntimeError(f"Data folder {DATA_DIR} has no files, nothing to index.")
+
     Settings.embed_model = getAzureLLMIndexEmbeddingModel()
     Settings.llm = getAzureLLMIndexModel()
-    print(f"Loading the document ...")
-    index = VectorStoreIndex.from_documents(documents)
-    print(f"creating the index ...")
+
+    manifest = {}
+    if PERSIST_DIR.exists():
+        print(f"Loading the existing index ...")
+        index = load_persisted_index()
+        if MANIFEST_PATH.exists():
+            manifest = json.loads(MANIFEST_PATH.read_text())
+        else:
+            # built before the manifest existed, doc ids can't be mapped back to files
+            print(f"No file manifest found, re-embedding all documents once ...")
+            for ref_doc_id in list(index.ref_doc_info.keys()):
+                index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+    else:
+        print(f"creating the index ...")
+        storage_context = StorageContext.from_defaults(vector_store=MmapVectorStore())
+        index = VectorStoreIndex(nodes=[], storage_context=storage_context)
+
+    file_hashes = {name: file_content_hash(path) for name, path in data_files.items()}
+
+    removed = [name for name in manifest if name not in data_files]
+    changed = [name for name in data_files if manifest.get(name, {}).get("hash") != file_hashes[name]]
+    for name in removed + changed:
+        for doc_id in manifest.pop(name, {}).get("doc_ids", []):
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+
+    print(f"{len(changed)} new or changed files, {len(removed)} removed, "
+          f"{len(data_files) - len(changed)} unchanged")
+    if changed:
+        print(f"Loading the document ...")
+        documents = []
+        for name in changed:
+            file_documents = SimpleDirectoryReader(
+                input_files=[data_files[name]],
+                filename_as_id=True
+            ).load_data()
+            manifest[name] = {
+                "hash": file_hashes[name],
+                "doc_ids": [doc.doc_id for doc in file_documents],
+            }
+            documents.extend(file_documents)
+        index.insert_nodes(Settings.node_parser.get_nodes_from_documents(documents))
+
     # store it for later
     index.storage_context.persist(persist_dir=PERSIST_DIR)
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2))
     print(f"persisted the index ...")
-else:
-    # load the existing index
-    Settings.embed_model = getAzureLLMIndexEmbeddingModel()
-    Settings.llm = getAzureLLMIndexModel()
-    print(f"Loading the existing index ...")
-    storage_context = StorageContext.from_defaults(persist_dir=PERSIST_DIR)
-    print(f"creating the index ...")
-    index = load_index_from_storage(storage_context)
+    return index
+
+
+def index_version() -> str:
+    """Version of the persisted index, changes whenever `build-index` re-embeds a file."""
+    return file_content_hash(MANIFEST_PATH) if MANIFEST_PATH.exists() else ""
+
+
+def get_index() -> VectorStoreIndex:
+    """Load the persisted index on first use; it is built separately with `build-index`."""
+    global _index
+    if _index is None:
+        if not PERSIST_DIR.exists():
+            raise RuntimeError(
+                f"No index found at {PERSIST_DIR}, run `python retrieval_agent.py build-index` first."
+            )
+        Settings.embed_model = getSharedIndexEmbeddingModel()
+        Settings.llm = getAzureLLMIndexModel()
+        print(f"Loading the existing index ...")
+        _index = load_persisted_index()
+    return _index
 
 class RetrievalAgent(Agent):
-    def __init__(self, index: VectorStoreIndex):
+    def __init__(self, index: VectorStoreIndex, models: dict, answer_cache: ScopedAnswerCache):
         super().__init__(
             instructions=(
                 "You are a voice assistant created by LiveKit. Your interface "
                 "with users will be voice. You should use short and concise "
                 "responses, and avoiding usage of unpronouncable punctuation."
             ),
-            vad=silero.VAD.load(),
-            stt=getAzureSTTModel(),
-            llm=getAzureLLMModel(),
-            tts=getAzureTTSModel(),
+            vad=models["vad"],
+            stt=models["stt"],
+            llm=models["llm"],
+            tts=models["tts"],
         )
         self.index = index
+        self.speculative_retriever = SpeculativeRetriever(
+            index.as_retriever(),
+            min_similarity=settings.SPECULATIVE_RETRIEVAL_MIN_SIMILARITY,
+        )
+        self.context_manager = RetrievalContextManager(
+            token_budget=settings.RETRIEVAL_CONTEXT_TOKEN_BUDGET,
+            header="Context that might help answer the user's question:",
+        )
+        self.answer_cache = answer_cache
+
+    async def on_enter(self):
+        # start retrieving from interim transcripts while the user is still speaking
+        self.speculative_retriever.attach(self.session)
 
     async def llm_node(
         self,
@@ -77,43 +192,59 @@ class RetrievalAgent(Agent):
         user_query = user_msg.text_content
         assert user_query is not None
 
-        retriever = self.index.as_retriever()
         print(f"RetrievalAgent: user query: {user_query}")
-        nodes = await retriever.aretrieve(user_query)
+        # a question already answered from this index goes straight to TTS,
+        # looked up while retrieval runs so a miss costs no extra latency
+        started = time.perf_counter()
+        retrieval = asyncio.create_task(self.speculative_retriever.retrieve(user_query))
+        try:
+            cached_answer = await self.answer_cache.lookup(user_query)
+        except BaseException:
+            retrieval.cancel()
+            raise
+        if cached_answer is not None:
+            retrieval.cancel()
+            return cached_answer
+        nodes = await retrieval
+        record_retrieval(self.session, time.perf_counter() - started)
 
         print(f"RetrievalAgent: retrieved {len(nodes)} nodes for query: {user_query}")
-        instructions = "Context that might help answer the user's question:"
-        for node in nodes:
-            node_content = node.get_content(metadata_mode=MetadataMode.LLM)
-            instructions += f"\n\n{node_content}"
-
-        # update the instructions for this turn, you may use some different methods
-        # to inject the context into the chat_ctx that fits the LLM you are using
-        system_msg = chat_ctx.items[0]
-        print(f"RetrievalAgent: system message: {system_msg}")
-        if isinstance(system_msg, llm.ChatMessage) and system_msg.role == "system":
-            # TODO(long): provide an api to update the instructions of chat_ctx
-            system_msg.content.append(instructions)
-        else:
-            chat_ctx.items.insert(0, llm.ChatMessage(role="system", content=[instructions]))
-            safe_instructions = instructions.replace("\n", "\\n")
-            print(f"update instructions: {safe_instructions}...")
+        # inject the context for this turn, replacing the previous turn's context
+        # so the system message stays within the token budget
+        self.context_manager.inject(chat_ctx, nodes)
 
         # update the instructions for agent
         # await self.update_instructions(instructions)
 
-        return Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        return self.answer_cache.record(
+            user_query, Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        )
+
+    async def tts_node(self, text: AsyncIterable[str], model_settings: ModelSettings):
+        # RAG answers run long, start speaking at the first clause instead of the first sentence
+        async for frame in early_flush_tts_node(self, text, model_settings):
+            yield frame
 
 
 async def entrypoint(ctx: JobContext):
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
 
-    agent = RetrievalAgent(index)
+    scoped_answer_cache = ScopedAnswerCache(
+        answer_cache,
+        scope="retrieval-agent",
+        version_fn=index_version,
+        min_words=settings.ANSWER_CACHE_MIN_WORDS,
+    )
+    agent = RetrievalAgent(get_index(), getPrewarmedModels(ctx.proc), scoped_answer_cache)
     session = AgentSession()
+    attach_session_metrics(ctx, session)
     await session.start(agent=agent, room=ctx.room)
 
-    await session.say("Hey, how can I help you today?", allow_interruptions=True)
+    await say_phrase(session, agent.tts, settings.AGENT_GREETING, allow_interruptions=True)
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint,agent_name="retrieval-agent"))
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "build-index":
+        build_index()
+        sys.exit(0)
+    cli.run_app(getWorkerOptions(entrypoint, agent_name="retrieval-agent"))
\ No newline at end of file
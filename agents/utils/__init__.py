@@ -5,6 +5,32 @@ from .utils import (
     getAzureSTTModel,
     getAzureTTSModel,
 )
+from .index_cache import (
+    IndexCache,
+    index_cache,
+    getChromaClient,
+    getSharedIndexEmbeddingModel,
+    read_index_version,
+)
+from .embedding_cache import (
+    QueryEmbeddingCache,
+    CachedQueryEmbedding,
+    query_embedding_cache,
+)
+from .answer_cache import SemanticAnswerCache, ScopedAnswerCache, answer_cache
+from .tenancy import tenant_key, tenant_filters, project_from_metadata
+from .context import RetrievalContextManager
+from .speculative import SpeculativeRetriever
+from .sparse_index import SparseIndex
+from .hybrid import HybridRetriever, reciprocal_rank_fusion
+from .vector_store import MmapVectorStore
+from .phrase_cache import PhraseAudioCache, phrase_cache, say_phrase
+from .prewarm import prewarm, getPrewarmedModels
+from .session_metrics import attach_session_metrics
+from .latency import TurnLatencyTracker, record_retrieval, record_first_audio, serve_latency_metrics
+from .speech_text import SpeechSegmenter, clean_markdown, segment_speech
+from .speech_pipeline import early_flush_tts_node, synthesize_segments
+from .worker import WorkerLoadMonitor, getWorkerOptions
 
 __all__ = [
     "getAzureLLMIndexModel",
@@ -12,4 +38,41 @@ __all__ = [
     "getAzureLLMModel",
     "getAzureSTTModel",
     "getAzureTTSModel",
+    "IndexCache",
+    "index_cache",
+    "getChromaClient",
+    "getSharedIndexEmbeddingModel",
+    "QueryEmbeddingCache",
+    "CachedQueryEmbedding",
+    "query_embedding_cache",
+    "read_index_version",
+    "SemanticAnswerCache",
+    "ScopedAnswerCache",
+    "answer_cache",
+    "tenant_key",
+    "tenant_filters",
+    "project_from_metadata",
+    "RetrievalContextManager",
+    "SpeculativeRetriever",
+    "SparseIndex",
+    "HybridRetriever",
+    "reciprocal_rank_fusion",
+    "MmapVectorStore",
+    "PhraseAudioCache",
+    "phrase_cache",
+    "say_phrase",
+    "prewarm",
+    "getPrewarmedModels",
+    "attach_session_metrics",
+    "TurnLatencyTracker",
+    "record_retrieval",
+    "record_first_audio",
+    "SpeechSegmenter",
+    "clean_markdown",
+    "segment_speech",
+    "early_flush_tts_node",
+    "synthesize_segments",
+    "serve_latency_metrics",
+    "WorkerLoadMonitor",
+    "getWorkerOptions",
 ]
\ No newline at end of file
@@ -0,0 +1,202 @@
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import AsyncIterable, Callable, List, Optional, Union
+
+import numpy as np
+from livekit.agents import llm
+from config import settings
+from .embedding_cache import normalize_query
+from .index_cache import getSharedIndexEmbeddingModel
+from .sparse_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    scope TEXT NOT NULL,
+    query TEXT NOT NULL,
+    version TEXT NOT NULL,
+    key_terms TEXT NOT NULL DEFAULT '',
+    embedding BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (scope, query)
+)
+"""
+
+
+def key_terms(query: str) -> str:
+    """
+    Terms a cached answer must share with the question: figures and years, and names
+    (words capitalized past the start of a sentence). "Revenue in 2022" and "revenue
+    in 2023" embed almost identically, their answers don't.
+    """
+    terms = {token for token in tokenize(query) if any(char.isdigit() for char in token)}
+    sentence_start = True
+    for word in query.split():
+        if not sentence_start and word[:1].isupper():
+            terms.update(tokenize(word))
+        sentence_start = word.endswith((".", "!", "?"))
+    return " ".join(sorted(terms))
+
+
+class SemanticAnswerCache:
+    """
+    Answers the agents gave, keyed by scope (a project) and question embedding.
+
+    A question whose embedding is within `min_similarity` (cosine) of a cached one
+    gets the cached answer, if it also has the same `key_terms`. Entries record the
+    index version they were answered
+    from and are dropped once the scope's index is re-ingested or `ttl_seconds`
+    pass. Stored in SQLite, shared by every job process on the worker.
+    """
+
+    def __init__(
+        self,
+        min_similarity: float,
+        max_entries_per_scope: int,
+        ttl_seconds: float,
+        db_path: Optional[str] = None,
+    ):
+        self.min_similarity = min_similarity
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(db_path or ":memory:", timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(_SCHEMA)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(answers)")}
+            if "key_terms" not in columns:
+                # answers cached before key terms were compared could be served for another year
+                self._db.execute("DELETE FROM answers")
+                self._db.execute("ALTER TABLE answers ADD COLUMN key_terms TEXT NOT NULL DEFAULT ''")
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Answer disk cache disabled, could not open {db_path}: {e}")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(_SCHEMA)
+
+    def lookup(self, scope: str, version: str, query: str, embedding: List[float]) -> Optional[str]:
+        """Blocking (SQLite and a scan of the scope's entries), call it off the event loop."""
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    "SELECT embedding, answer FROM answers "
+                    "WHERE scope = ? AND version = ? AND key_terms = ? AND created_at > ?",
+                    (scope, version, key_terms(query), time.time() - self.ttl_seconds),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading answer cache: {e}")
+                return None
+
+            if rows:
+                matrix = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+                similarities = matrix @ _normalize(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.min_similarity:
+                    self.hits += 1
+                    return rows[best][1]
+            self.misses += 1
+            return None
+
+    def store(self, scope: str, version: str, query: str, embedding: List[float], answer: str) -> None:
+        """Blocking like `lookup`."""
+        with self._lock:
+            try:
+                # answers from an earlier ingestion of the scope will never be served again
+                self._db.execute("DELETE FROM answers WHERE scope = ? AND version != ?", (scope, version))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (scope, query, version, key_terms, embedding, answer, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        scope, normalize_query(query), version, key_terms(query),
+                        _normalize(embedding).tobytes(), answer, time.time(),
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM answers WHERE scope = ? AND rowid NOT IN "
+                    "(SELECT rowid FROM answers WHERE scope = ? ORDER BY created_at DESC LIMIT ?)",
+                    (scope, scope, self.max_entries_per_scope),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing answer cache: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class ScopedAnswerCache:
+    """
+    An agent's view of the answer cache for one project. `version_fn` returns the
+    project's current index version and is read on every lookup, so a re-ingestion
+    takes effect on the next question.
+
+    Only questions of at least `min_words` words are cached; short follow-ups
+    ("and last year?") depend on the conversation, not just on the question.
+    """
+
+    def __init__(self, cache: SemanticAnswerCache, scope: str, version_fn: Callable[[], str], min_words: int):
+        self.cache = cache
+        self.scope = scope
+        self.version_fn = version_fn
+        self.min_words = min_words
+
+    def _cacheable(self, query: str) -> bool:
+        return len(normalize_query(query).split()) >= self.min_words
+
+    async def lookup(self, query: str) -> Optional[str]:
+        if not self._cacheable(query):
+            return None
+        # also the embedding retrieval needs, served from the query embedding cache afterwards
+        embedding = await getSharedIndexEmbeddingModel().aget_query_embedding(query)
+        answer = await asyncio.to_thread(self.cache.lookup, self.scope, self.version_fn(), query, embedding)
+        if answer is not None:
+            logger.info(f"answer cache hit for {self.scope}: {query}")
+        return answer
+
+    async def record(
+        self, query: str, stream: AsyncIterable[Union[llm.ChatChunk, str]]
+    ) -> AsyncIterable[Union[llm.ChatChunk, str]]:
+        """Pass the LLM stream through and cache the answer once it completed uninterrupted."""
+        version = self.version_fn()
+        parts = []
+        has_tool_calls = False
+        async for chunk in stream:
+            if isinstance(chunk, str):
+                parts.append(chunk)
+            elif chunk.delta is not None:
+                parts.append(chunk.delta.content or "")
+                has_tool_calls = has_tool_calls or bool(chunk.delta.tool_calls)
+            yield chunk
+
+        answer = "".join(parts).strip()
+        if answer and not has_tool_calls and self._cacheable(query):
+            embedding = await getSharedIndexEmbeddingModel().aget_query_embedding(query)
+            await asyncio.to_thread(self.cache.store, self.scope, version, query, embedding, answer)
+
+
+answer_cache = SemanticAnswerCache(
+    min_similarity=settings.ANSWER_CACHE_MIN_SIMILARITY,
+    max_entries_per_scope=settings.ANSWER_CACHE_MAX_ENTRIES_PER_PROJECT,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    db_path=settings.ANSWER_CACHE_PATH or None,
+)
@@ -0,0 +1,78 @@
+import logging
+from typing import List, Optional
+
+from livekit.agents import llm
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalContextManager:
+    """
+    Keeps the retrieved context injected into the system message bounded.
+
+    Each turn the previous turn's context block is removed before the new one is
+    added, nodes are deduplicated by node_id, and the block is truncated to
+    `token_budget` tokens, so the prompt does not grow with the length of the call.
+    """
+
+    def __init__(self, token_budget: int, header: str):
+        self.token_budget = token_budget
+        self.header = header
+        self._tokenizer = get_tokenizer()
+        self._injected: Optional[str] = None
+        self._injected_node_ids: List[str] = []
+
+    def build(self, nodes: List[NodeWithScore]) -> str:
+        """Build the context block for this turn within the token budget."""
+        context = self.header
+        used_tokens = self._count_tokens(context)
+        seen_ids = set()
+        node_ids = []
+
+        for node in nodes:
+            if node.node_id in seen_ids:
+                continue
+            seen_ids.add(node.node_id)
+
+            node_content = f"\n\n{node.get_content(metadata_mode=MetadataMode.LLM)}"
+            node_tokens = self._count_tokens(node_content)
+            remaining = self.token_budget - used_tokens
+            if remaining <= 0:
+                break
+            if node_tokens > remaining:
+                # keep the head of the chunk, the tokenizer only encodes so cut proportionally
+                node_content = node_content[: int(len(node_content) * remaining / node_tokens)]
+                node_tokens = remaining
+
+            context += node_content
+            used_tokens += node_tokens
+            node_ids.append(node.node_id)
+
+        reused = len(set(node_ids) & set(self._injected_node_ids))
+        logger.debug(
+            f"retrieval context: {len(node_ids)} nodes ({reused} carried over), "
+            f"~{used_tokens}/{self.token_budget} tokens"
+        )
+        self._injected_node_ids = node_ids
+        return context
+
+    def inject(self, chat_ctx: llm.ChatContext, nodes: List[NodeWithScore]) -> str:
+        """Replace the previous turn's context in the system message with this turn's."""
+        context = self.build(nodes)
+
+        system_msg = chat_ctx.items[0] if chat_ctx.items else None
+        if isinstance(system_msg, llm.ChatMessage) and system_msg.role == "system":
+            # the system message is shared across turns, so drop what we added last time
+            if self._injected is not None:
+                system_msg.content[:] = [c for c in system_msg.content if c is not self._injected]
+            system_msg.content.append(context)
+        else:
+            chat_ctx.items.insert(0, llm.ChatMessage(role="system", content=[context]))
+
+        self._injected = context
+        return context
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
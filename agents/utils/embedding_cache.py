@@ -0,0 +1,219 @@
+import re
+import asyncio
+import sqlite3
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a user utterance so trivially different transcripts share a cache key.
+    """
+    text = _PUNCTUATION_RE.sub(" ", text.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Normalized query text -> embedding cache.
+
+    An in-memory LRU sits in front of an optional SQLite table, which is shared by
+    every job process on the worker so repeated questions skip the embedding call.
+    """
+
+    def __init__(self, max_entries: int, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # separate from the LRU's lock, so an in-memory hit never waits on SQLite
+        self._db_lock = threading.Lock()
+        self._db = None
+        if db_path:
+            try:
+                self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "model TEXT NOT NULL, query TEXT NOT NULL, embedding BLOB NOT NULL, "
+                    "PRIMARY KEY (model, query))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Query embedding disk cache disabled, could not open {db_path}: {e}")
+                self._db = None
+
+    def get(self, model_key: str, query: str) -> Optional[List[float]]:
+        key = (model_key, normalize_query(query))
+        embedding = self._get_from_memory(key)
+        if embedding is None:
+            embedding = self._get_from_disk(key)
+        self._count(embedding)
+        return embedding
+
+    async def aget(self, model_key: str, query: str) -> Optional[List[float]]:
+        """Like `get`, with the SQLite read off the event loop."""
+        key = (model_key, normalize_query(query))
+        embedding = self._get_from_memory(key)
+        if embedding is None and self._db is not None:
+            embedding = await asyncio.to_thread(self._get_from_disk, key)
+        self._count(embedding)
+        return embedding
+
+    def put(self, model_key: str, query: str, embedding: List[float]) -> None:
+        key = (model_key, normalize_query(query))
+        with self._lock:
+            self._remember(key, embedding)
+        self._write_to_disk(key, embedding)
+
+    async def aput(self, model_key: str, query: str, embedding: List[float]) -> None:
+        """Like `put`, with the SQLite write and commit off the event loop."""
+        key = (model_key, normalize_query(query))
+        with self._lock:
+            self._remember(key, embedding)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_to_disk, key, embedding)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _get_from_memory(self, key: tuple) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+            return embedding
+
+    def _get_from_disk(self, key: tuple) -> Optional[List[float]]:
+        embedding = self._read_from_disk(key)
+        if embedding is not None:
+            with self._lock:
+                self._remember(key, embedding)
+        return embedding
+
+    def _count(self, embedding: Optional[List[float]]) -> None:
+        with self._lock:
+            if embedding is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _remember(self, key: tuple, embedding: List[float]) -> None:
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_from_disk(self, key: tuple) -> Optional[List[float]]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT embedding FROM query_embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading query embedding cache: {e}")
+            return None
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def _write_to_disk(self, key: tuple, embedding: List[float]) -> None:
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, query, embedding) VALUES (?, ?, ?)",
+                    (*key, array("f", embedding).tobytes()),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing query embedding cache: {e}")
+
+
+def embedding_model_key(embed_model: BaseEmbedding) -> str:
+    """
+    Cache key of the model behind an embedding client. On Azure `model_name` is the
+    llama_index default whatever the deployment serves, so the deployment is part of it.
+    """
+    deployment = getattr(embed_model, "azure_deployment", None) or getattr(embed_model, "deployment_name", None)
+    return f"{embed_model.model_name}@{deployment}" if deployment else embed_model.model_name
+
+
+class CachedQueryEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model so query embeddings go through a QueryEmbeddingCache.
+    Text (document) embeddings are passed straight through.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: QueryEmbeddingCache = PrivateAttr()
+    _model_key: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: QueryEmbeddingCache):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+        self._model_key = embedding_model_key(embed_model)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedQueryEmbedding"
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        embedding = self._cache.get(self._model_key, query)
+        if embedding is None:
+            embedding = self._embed_model.get_query_embedding(query)
+            self._cache.put(self._model_key, query, embedding)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        embedding = await self._cache.aget(self._model_key, query)
+        if embedding is None:
+            embedding = await self._embed_model.aget_query_embedding(query)
+            await self._cache.aput(self._model_key, query, embedding)
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._embed_model.get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._embed_model.aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._embed_model.get_text_embedding_batch(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._embed_model.aget_text_embedding_batch(texts)
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    db_path=settings.QUERY_EMBEDDING_CACHE_PATH or None,
+)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from .sparse_index import SparseIndex
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank), best first."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses vector retrieval with the tenant's BM25 index using reciprocal rank fusion,
+    so chunks that share exact tokens with the question (company names, fiscal years,
+    figures) rank high even when their embeddings are not the closest. Both stages run
+    locally; nodes found only by BM25 are read from the vector store by id.
+    """
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        sparse_index: SparseIndex,
+        vector_store: BasePydanticVectorStore,
+        top_k: int,
+        sparse_top_k: int,
+        rrf_k: int = 60,
+        project_id: Optional[str] = None,
+    ):
+        super().__init__()
+        self.vector_retriever = vector_retriever
+        self.sparse_index = sparse_index
+        self.vector_store = vector_store
+        self.top_k = top_k
+        self.sparse_top_k = sparse_top_k
+        self.rrf_k = rrf_k
+        self.project_id = project_id
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = self.vector_retriever.retrieve(query_bundle)
+        sparse = self.sparse_index.search(query_bundle.query_str, self.sparse_top_k, self.project_id)
+        return self._fuse(dense, sparse)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense, sparse = await asyncio.gather(
+            self.vector_retriever.aretrieve(query_bundle),
+            asyncio.to_thread(self.sparse_index.search, query_bundle.query_str, self.sparse_top_k, self.project_id),
+        )
+        # chroma's client is synchronous
+        return await asyncio.to_thread(self._fuse, dense, sparse)
+
+    def _fuse(self, dense: List[NodeWithScore], sparse: List[Tuple[str, float]]) -> List[NodeWithScore]:
+        nodes: Dict[str, BaseNode] = {result.node.node_id: result.node for result in dense}
+        fused = reciprocal_rank_fusion(
+            [[result.node.node_id for result in dense], [node_id for node_id, _ in sparse]],
+            k=self.rrf_k,
+        )
+        # at most sparse_top_k ids, read in one call
+        missing = [node_id for node_id, _ in fused if node_id not in nodes]
+        if missing:
+            for node in self.vector_store.get_nodes(node_ids=missing):
+                nodes[node.node_id] = node
+        # ids of nodes re-ingested since the BM25 index was loaded are no longer stored
+        results = [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in fused if node_id in nodes]
+        logger.debug(
+            f"hybrid retrieval: {len(dense)} vector, {len(sparse)} bm25, {len(missing)} fetched by id"
+        )
+        return results[:self.top_k]
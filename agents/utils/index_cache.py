@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import chromadb
+from llama_index.core import VectorStoreIndex
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from config import settings
+from .utils import getAzureLLMIndexEmbeddingModel
+from .embedding_cache import CachedQueryEmbedding, query_embedding_cache
+from .sparse_index import SparseIndex
+
+logger = logging.getLogger(__name__)
+
+# Written by the ingestion API after every successful store, one file per tenant.
+INDEX_VERSION_DIR = "index_versions"
+
+_chroma_client = None
+_index_embed_model = None
+_client_lock = threading.Lock()
+
+
+def getChromaClient() -> chromadb.ClientAPI:
+    """
+    Get the process-wide Chroma client, opening it on first use.
+    """
+    global _chroma_client
+    with _client_lock:
+        if _chroma_client is None:
+            if settings.CHROMA_HOST:
+                _chroma_client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            else:
+                _chroma_client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+        return _chroma_client
+
+
+def getSharedIndexEmbeddingModel():
+    """
+    Get the process-wide embedding model used to query the vector indexes,
+    with query embeddings served from the shared query embedding cache.
+    """
+    global _index_embed_model
+    with _client_lock:
+        if _index_embed_model is None:
+            _index_embed_model = CachedQueryEmbedding(
+                getAzureLLMIndexEmbeddingModel(),
+                query_embedding_cache
+            )
+        return _index_embed_model
+
+
+def read_index_version(tenant_key: str) -> str:
+    """
+    Read the version stamp the ingestion side wrote for a tenant ("" if none).
+    """
+    path = os.path.join(settings.CHROMA_PERSIST_DIR, INDEX_VERSION_DIR, f"{tenant_key}.version")
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+class _IndexCacheEntry:
+    __slots__ = ("sparse_index", "version", "loaded_at")
+
+    def __init__(self, sparse_index: Optional[SparseIndex], version: str, loaded_at: float):
+        self.sparse_index = sparse_index
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+class IndexCache:
+    """
+    One VectorStoreIndex over the shared collection, loaded once per process, plus a
+    bounded LRU of each tenant's BM25 index keyed by tenant key. Retrieval is scoped
+    to the tenant with `tenant_filters`.
+
+    The vector index reads Chroma live, so only the BM25 entries need refreshing:
+    they expire after `ttl_seconds` or as soon as the ingestion version stamp for
+    their tenant changes, so fresh uploads are picked up on the next call.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._index: Optional[VectorStoreIndex] = None
+        self._entries: "OrderedDict[str, _IndexCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+    def get(self, tenant_key: str) -> Tuple[VectorStoreIndex, Optional[SparseIndex]]:
+        """
+        The vector index and the tenant's BM25 index, counted as one cache lookup.
+        The BM25 index is None until the ingestion API has written one.
+        """
+        return self._shared_index(), self._get_entry(tenant_key).sparse_index
+
+    def _shared_index(self) -> VectorStoreIndex:
+        with self._index_lock:
+            if self._index is None:
+                self._index = self._load()
+            return self._index
+
+    def _get_entry(self, tenant_key: str) -> _IndexCacheEntry:
+        version = read_index_version(tenant_key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(tenant_key)
+            if entry is not None:
+                if entry.version == version and now - entry.loaded_at < self.ttl_seconds:
+                    self._entries.move_to_end(tenant_key)
+                    self.hits += 1
+                    return entry
+                del self._entries[tenant_key]
+            self.misses += 1
+
+        entry = _IndexCacheEntry(SparseIndex.load(tenant_key), version, now)
+
+        with self._lock:
+            self._entries[tenant_key] = entry
+            self._entries.move_to_end(tenant_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, tenant_key: Optional[str] = None) -> None:
+        with self._lock:
+            if tenant_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tenant_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _load(self) -> VectorStoreIndex:
+        collection = getChromaClient().get_collection(settings.CHROMA_COLLECTION)
+        vector_store = ChromaVectorStore(chroma_collection=collection)
+        return VectorStoreIndex.from_vector_store(
+            vector_store,
+            embed_model=getSharedIndexEmbeddingModel()
+        )
+
+
+index_cache = IndexCache(
+    max_entries=settings.INDEX_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.INDEX_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,153 @@
+import os
+import glob
+import time
+import logging
+import statistics
+import weakref
+from typing import Dict, Optional
+
+from livekit.agents import AgentSession, metrics
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+# Stages of a voice turn, in the order they happen. stt is the transcription delay
+# inside the end-of-utterance wait; first_audio is first LLM text to first synthesized
+# audio, including segmentation; total is end of user speech to agent audio.
+TURN_STAGES = ("eou_delay", "stt", "retrieval", "llm_ttft", "tts_ttfb", "first_audio", "total")
+# Voice latency budgets are tight, so most buckets sit under two seconds.
+_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+_histogram = None
+_trackers: "weakref.WeakKeyDictionary[AgentSession, TurnLatencyTracker]" = weakref.WeakKeyDictionary()
+
+
+def _get_histogram():
+    global _histogram
+    if _histogram is None and prometheus_client is not None:
+        _histogram = prometheus_client.Histogram(
+            "voice_turn_stage_seconds",
+            "Latency of each stage of a voice agent turn.",
+            ["agent", "stage"],
+            buckets=_BUCKETS,
+        )
+    return _histogram
+
+
+def serve_latency_metrics(port: int, multiproc_dir: str) -> None:
+    """
+    Serve the turn latency histograms of every job process on a local Prometheus
+    scrape endpoint. Call in the worker's main process, before job processes start,
+    so they inherit PROMETHEUS_MULTIPROC_DIR and write their samples there.
+    """
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed, turn latency is only logged")
+        return
+    os.makedirs(multiproc_dir, exist_ok=True)
+    # samples of a previous run would be merged into this one
+    for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+        os.remove(path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+    prometheus_client.start_http_server(port, registry=registry)
+    logger.info(f"serving turn latency metrics on :{port}/metrics")
+
+
+class TurnLatencyTracker:
+    """
+    Per-turn latency breakdown for one session.
+
+    A turn starts with its end-of-utterance metrics. LLM and TTS metrics are matched
+    to it by speech id (they are emitted when their streams finish, often after the
+    agent started speaking), the agent's llm_node reports retrieval time through
+    `record_retrieval` and its tts_node the time to first audio through
+    `record_first_audio`, and the turn's total is taken when the agent starts speaking.
+    Every stage is observed in the `voice_turn_stage_seconds` histogram as it is recorded.
+    """
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        # speech id -> stage -> seconds
+        self.turns: Dict[str, Dict[str, float]] = {}
+        self._current: Optional[str] = None
+        self._speech_ended_at: Optional[float] = None
+
+    def attach(self, session: AgentSession) -> None:
+        _trackers[session] = self
+        session.on("metrics_collected", lambda ev: self.on_metrics(ev.metrics))
+        session.on("agent_state_changed", self._on_agent_state_changed)
+
+    def on_metrics(self, agent_metrics: metrics.AgentMetrics) -> None:
+        if isinstance(agent_metrics, metrics.EOUMetrics):
+            self._current = agent_metrics.speech_id or f"turn-{len(self.turns)}"
+            # the metrics are emitted when the turn is committed, end_of_utterance_delay after speech ended
+            self._speech_ended_at = time.time() - agent_metrics.end_of_utterance_delay
+            self._record(self._current, "eou_delay", agent_metrics.end_of_utterance_delay)
+            self._record(self._current, "stt", agent_metrics.transcription_delay)
+        elif isinstance(agent_metrics, metrics.LLMMetrics):
+            self._record(self._turn_of(agent_metrics.speech_id), "llm_ttft", agent_metrics.ttft)
+        elif isinstance(agent_metrics, metrics.TTSMetrics):
+            self._record(self._turn_of(agent_metrics.speech_id), "tts_ttfb", agent_metrics.ttfb)
+
+    def record_retrieval(self, seconds: float) -> None:
+        self._record(self._current, "retrieval", seconds)
+
+    def record_first_audio(self, seconds: float) -> None:
+        self._record(self._current, "first_audio", seconds)
+
+    def _turn_of(self, speech_id: Optional[str]) -> Optional[str]:
+        # speech without a user turn (e.g. the greeting) has no entry and is not tracked
+        return speech_id if speech_id in self.turns else self._current
+
+    def _on_agent_state_changed(self, ev) -> None:
+        if ev.new_state == "speaking" and self._speech_ended_at is not None:
+            self._record(self._current, "total", time.time() - self._speech_ended_at)
+            self._speech_ended_at = None
+
+    def _record(self, turn_id: Optional[str], stage: str, seconds: float) -> None:
+        if turn_id is None:
+            return
+        turn = self.turns.setdefault(turn_id, {})
+        if stage in turn and stage != "retrieval":
+            # only the first LLM call and TTS segment of a turn are on the latency path
+            return
+        turn[stage] = turn.get(stage, 0.0) + seconds
+        histogram = _get_histogram()
+        if histogram is not None:
+            histogram.labels(agent=self.agent_name, stage=stage).observe(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean, p50, p95 and max per stage over the session's turns, in seconds."""
+        summary = {}
+        for stage in TURN_STAGES:
+            values = sorted(turn[stage] for turn in self.turns.values() if stage in turn)
+            if not values:
+                continue
+            summary[stage] = {
+                "count": len(values),
+                "mean": statistics.fmean(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+            }
+        return summary
+
+
+def record_retrieval(session: AgentSession, seconds: float) -> None:
+    """Attribute retrieval time to the session's current turn, if it is being tracked."""
+    tracker = _trackers.get(session)
+    if tracker is not None:
+        tracker.record_retrieval(seconds)
+
+
+def record_first_audio(session: AgentSession, seconds: float) -> None:
+    """Attribute the time from first LLM text to first audio to the session's current turn."""
+    tracker = _trackers.get(session)
+    if tracker is not None:
+        tracker.record_first_audio(seconds)
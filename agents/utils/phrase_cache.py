@@ -0,0 +1,176 @@
+import os
+import wave
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Optional, Set
+
+from livekit import rtc
+from livekit.agents import AgentSession, tts
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Length of the frames cached audio is played back in.
+FRAME_DURATION_MS = 100
+_TTS_OPTION_FIELDS = ("model", "voice", "speed", "instructions", "response_format")
+
+
+def phrase_key(tts_model: tts.TTS, text: str) -> str:
+    """Hash of the phrase and every TTS setting that changes how it sounds."""
+    opts = getattr(tts_model, "_opts", None)
+    settings_repr = [type(tts_model).__name__, tts_model.sample_rate, tts_model.num_channels]
+    settings_repr.extend(getattr(opts, field, None) for field in _TTS_OPTION_FIELDS)
+    return hashlib.sha256(repr((settings_repr, text)).encode("utf-8")).hexdigest()
+
+
+class PhraseAudioCache:
+    """
+    Synthesized audio of fixed phrases (greetings, prompts), keyed by phrase and TTS
+    settings. Kept in an in-memory LRU in front of WAV files in `cache_dir`, which
+    every worker on the host shares, so each phrase is synthesized once.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, rtc.AudioFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._filling: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, tts_model: tts.TTS, text: str) -> Optional[rtc.AudioFrame]:
+        key = phrase_key(tts_model, text)
+        with self._lock:
+            frame = self._entries.get(key)
+            if frame is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return frame
+
+        frame = self._read_from_disk(key)
+        with self._lock:
+            if frame is not None:
+                self._remember(key, frame)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return frame
+
+    def load(self, tts_model: tts.TTS, text: str) -> bool:
+        """Load a phrase synthesized earlier into memory, e.g. from prewarm."""
+        key = phrase_key(tts_model, text)
+        frame = self._read_from_disk(key)
+        if frame is None:
+            return False
+        with self._lock:
+            self._remember(key, frame)
+        return True
+
+    async def fill(self, tts_model: tts.TTS, text: str) -> None:
+        """Synthesize a phrase and store it in memory and on disk."""
+        key = phrase_key(tts_model, text)
+        if key in self._filling:
+            return
+        self._filling.add(key)
+        try:
+            frames = []
+            async with tts_model.synthesize(text) as stream:
+                async for audio in stream:
+                    frames.append(audio.frame)
+            frame = rtc.combine_audio_frames(frames)
+            await asyncio.to_thread(self._write_to_disk, key, frame)
+            with self._lock:
+                self._remember(key, frame)
+            logger.info(f"cached {frame.duration:.1f}s of audio for phrase: {text}")
+        except Exception as e:
+            logger.warning(f"could not cache audio for phrase {text!r}: {e}")
+        finally:
+            self._filling.discard(key)
+
+    def fill_in_background(self, tts_model: tts.TTS, text: str) -> None:
+        task = asyncio.create_task(self.fill(tts_model, text))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+    def _remember(self, key: str, frame: rtc.AudioFrame) -> None:
+        self._entries[key] = frame
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _read_from_disk(self, key: str) -> Optional[rtc.AudioFrame]:
+        try:
+            with wave.open(self._path(key), "rb") as f:
+                return rtc.AudioFrame(
+                    data=f.readframes(f.getnframes()),
+                    sample_rate=f.getframerate(),
+                    num_channels=f.getnchannels(),
+                    samples_per_channel=f.getnframes(),
+                )
+        except FileNotFoundError:
+            return None
+        except (wave.Error, EOFError) as e:
+            logger.error(f"Error reading phrase audio cache: {e}")
+            return None
+
+    def _write_to_disk(self, key: str, frame: rtc.AudioFrame) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as f:
+            f.setnchannels(frame.num_channels)
+            f.setsampwidth(2)
+            f.setframerate(frame.sample_rate)
+            f.writeframes(bytes(frame.data))
+        os.replace(tmp_path, path)
+
+
+async def _iter_frames(frame: rtc.AudioFrame) -> AsyncIterator[rtc.AudioFrame]:
+    """Split cached audio into playback-sized frames."""
+    samples = frame.sample_rate * FRAME_DURATION_MS // 1000
+    data = bytes(frame.data)
+    bytes_per_frame = samples * frame.num_channels * 2
+    for start in range(0, len(data), bytes_per_frame):
+        chunk = data[start:start + bytes_per_frame]
+        yield rtc.AudioFrame(
+            data=chunk,
+            sample_rate=frame.sample_rate,
+            num_channels=frame.num_channels,
+            samples_per_channel=len(chunk) // (frame.num_channels * 2),
+        )
+
+
+def say_phrase(session: AgentSession, tts_model: tts.TTS, text: str, allow_interruptions: bool = True):
+    """
+    Say a fixed phrase, playing its cached audio when there is some. The first time
+    a phrase is said it goes through TTS as usual and is cached in the background.
+    """
+    frame = phrase_cache.get(tts_model, text)
+    if frame is None:
+        phrase_cache.fill_in_background(tts_model, text)
+        return session.say(text, allow_interruptions=allow_interruptions)
+    return session.say(text, audio=_iter_frames(frame), allow_interruptions=allow_interruptions)
+
+
+phrase_cache = PhraseAudioCache(
+    cache_dir=settings.PHRASE_CACHE_DIR,
+    max_entries=settings.PHRASE_CACHE_MAX_ENTRIES,
+)
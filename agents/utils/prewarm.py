@@ -0,0 +1,46 @@
+import logging
+from livekit.agents import JobProcess
+from livekit.plugins import silero
+from .utils import getAzureSTTModel, getAzureLLMModel, getAzureTTSModel
+from .index_cache import getChromaClient, getSharedIndexEmbeddingModel
+from .phrase_cache import phrase_cache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# The turn detector is not listed: it needs the job's inference executor, so it is
+# created per job, and its weights are already loaded by the worker's inference runner.
+_MODEL_FACTORIES = {
+    "vad": silero.VAD.load,
+    "stt": getAzureSTTModel,
+    "llm": getAzureLLMModel,
+    "tts": getAzureTTSModel,
+}
+
+
+def prewarm(proc: JobProcess):
+    """
+    Load models and open clients once per job process, before any job is assigned.
+    Pass as `prewarm_fnc` to every WorkerOptions.
+    """
+    for name, factory in _MODEL_FACTORIES.items():
+        proc.userdata[name] = factory()
+    proc.userdata["chroma_client"] = getChromaClient()
+    proc.userdata["index_embed_model"] = getSharedIndexEmbeddingModel()
+    # the greeting plays from memory as soon as the session starts
+    phrase_cache.load(proc.userdata["tts"], settings.AGENT_GREETING)
+    logger.info(f"prewarmed job process with: {', '.join(proc.userdata.keys())}")
+
+
+def getPrewarmedModels(proc: JobProcess) -> dict:
+    """
+    Get the prewarmed vad, stt, llm and tts for a job.
+    Anything prewarm did not load is created here so entry points still work without it.
+    """
+    models = {}
+    for name, factory in _MODEL_FACTORIES.items():
+        if name not in proc.userdata:
+            logger.warning(f"{name} was not prewarmed, loading it in the job")
+            proc.userdata[name] = factory()
+        models[name] = proc.userdata[name]
+    return models
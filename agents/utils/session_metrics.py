@@ -0,0 +1,48 @@
+import logging
+from livekit.agents import AgentSession, JobContext, metrics
+from .embedding_cache import query_embedding_cache
+from .answer_cache import answer_cache
+from .latency import TurnLatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+def attach_session_metrics(ctx: JobContext, session: AgentSession) -> metrics.UsageCollector:
+    """
+    Log pipeline metrics for the session, track its per-turn latency breakdown and,
+    when the job shuts down, log its usage and latency summaries together with the
+    query embedding and answer cache hit rates seen by this session.
+    """
+    usage_collector = metrics.UsageCollector()
+    latency_tracker = TurnLatencyTracker(agent_name=ctx.job.agent_name or "default")
+    cache_stats_at_start = query_embedding_cache.stats()
+    answer_stats_at_start = answer_cache.stats()
+
+    def on_metrics_collected(ev):
+        metrics.log_metrics(ev.metrics)
+        usage_collector.collect(ev.metrics)
+
+    async def log_session_summary():
+        cache_stats = query_embedding_cache.stats()
+        hits = cache_stats["hits"] - cache_stats_at_start["hits"]
+        misses = cache_stats["misses"] - cache_stats_at_start["misses"]
+        lookups = hits + misses
+        logger.info(f"usage summary: {usage_collector.get_summary()}")
+        for stage, stats in latency_tracker.summary().items():
+            logger.info(
+                f"turn latency {stage}: {stats['count']} turns, mean {stats['mean'] * 1000:.0f}ms, "
+                f"p50 {stats['p50'] * 1000:.0f}ms, p95 {stats['p95'] * 1000:.0f}ms, max {stats['max'] * 1000:.0f}ms"
+            )
+        logger.info(
+            f"query embedding cache: {hits} hits / {misses} misses "
+            f"(hit rate {hits / lookups if lookups else 0.0:.2f})"
+        )
+        answer_stats = answer_cache.stats()
+        answer_hits = answer_stats["hits"] - answer_stats_at_start["hits"]
+        answer_misses = answer_stats["misses"] - answer_stats_at_start["misses"]
+        logger.info(f"answer cache: {answer_hits} hits / {answer_misses} misses")
+
+    session.on("metrics_collected", on_metrics_collected)
+    latency_tracker.attach(session)
+    ctx.add_shutdown_callback(log_session_summary)
+    return usage_collector
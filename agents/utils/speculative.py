@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+from livekit.agents import AgentSession
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from .embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeRetriever:
+    """
+    Starts retrieval from interim transcripts while the user is still speaking.
+
+    When the turn ends, the in-flight result is reused if its transcript is close
+    enough to the final one, otherwise it is cancelled and the final query is retrieved.
+    """
+
+    def __init__(self, retriever: BaseRetriever, min_similarity: float, min_words: int = 2):
+        self.retriever = retriever
+        self.min_similarity = min_similarity
+        self.min_words = min_words
+        self.reused = 0
+        self.discarded = 0
+        self._query: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def attach(self, session: AgentSession) -> None:
+        """Prefetch on every (interim or final) user transcript of the session."""
+        session.on("user_input_transcribed", lambda ev: self.prefetch(ev.transcript))
+
+    def prefetch(self, transcript: str) -> None:
+        query = normalize_query(transcript)
+        if len(query.split()) < self.min_words:
+            return
+        # the in-flight lookup already covers this transcript, let it finish
+        if self._task is not None and self._similarity(self._query, query) >= self.min_similarity:
+            return
+
+        self.discard()
+        self._query = query
+        self._task = asyncio.create_task(self.retriever.aretrieve(transcript))
+        # a discarded lookup may fail unobserved, don't let asyncio warn about it
+        self._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def retrieve(self, query: str) -> List[NodeWithScore]:
+        """Get the nodes for the final transcript, reusing the speculative lookup if it matches."""
+        task, speculative_query = self._task, self._query
+        self._task, self._query = None, None
+
+        if task is not None:
+            if self._similarity(speculative_query, normalize_query(query)) >= self.min_similarity:
+                try:
+                    nodes = await task
+                    self.reused += 1
+                    return nodes
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"speculative retrieval failed, retrying with final transcript: {e}")
+            else:
+                task.cancel()
+            self.discarded += 1
+
+        return await self.retriever.aretrieve(query)
+
+    def discard(self) -> None:
+        """Cancel the in-flight lookup, e.g. when the turn is answered without retrieval."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.discarded += 1
+        self._task, self._query = None, None
+
+    @staticmethod
+    def _similarity(a: Optional[str], b: str) -> float:
+        if not a:
+            return 0.0
+        return SequenceMatcher(None, a, b).ratio()
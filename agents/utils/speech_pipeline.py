@@ -0,0 +1,109 @@
+import time
+import asyncio
+import logging
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+from livekit import rtc
+from livekit.agents import Agent, tts
+from livekit.agents.voice.agent import ModelSettings
+from config import settings
+from .speech_text import segment_speech
+from .latency import record_first_audio
+
+logger = logging.getLogger(__name__)
+
+
+async def _synthesize_into(tts_model: tts.TTS, text: str, frames: asyncio.Queue) -> None:
+    try:
+        async with tts_model.synthesize(text) as stream:
+            async for audio in stream:
+                frames.put_nowait(audio.frame)
+    finally:
+        frames.put_nowait(None)
+
+
+async def synthesize_segments(
+    tts_model: tts.TTS, segments: AsyncIterable[str], max_ahead: int
+) -> AsyncIterator[rtc.AudioFrame]:
+    """
+    Synthesize segments in order, each one streamed as its audio arrives. Up to
+    `max_ahead` later segments are synthesized while an earlier one plays, so
+    there is no gap waiting for the next segment's first byte.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    # the segment playing plus the ones synthesized ahead of it
+    slots = asyncio.Semaphore(max_ahead + 1)
+    tasks: List[asyncio.Task] = []
+
+    async def produce():
+        try:
+            async for segment in segments:
+                await slots.acquire()
+                frames: asyncio.Queue = asyncio.Queue()
+                task = asyncio.create_task(_synthesize_into(tts_model, segment, frames))
+                tasks.append(task)
+                pending.put_nowait((task, frames))
+        finally:
+            pending.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await pending.get()) is not None:
+            task, frames = item
+            while (frame := await frames.get()) is not None:
+                yield frame
+            # surfaces a failed synthesis instead of silently skipping the segment
+            await task
+            slots.release()
+        # surfaces a failed text stream
+        await producer
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+async def _time_first_audio(
+    agent: Agent, text: AsyncIterable[str], audio_fn
+) -> AsyncIterator[rtc.AudioFrame]:
+    text_started: Optional[float] = None
+
+    async def timed_text():
+        nonlocal text_started
+        async for chunk in text:
+            if text_started is None:
+                text_started = time.perf_counter()
+            yield chunk
+
+    first = True
+    async for frame in audio_fn(timed_text()):
+        if first and text_started is not None:
+            record_first_audio(agent.session, time.perf_counter() - text_started)
+            first = False
+        yield frame
+
+
+async def early_flush_tts_node(
+    agent: Agent, text: AsyncIterable[str], model_settings: ModelSettings
+) -> AsyncIterator[rtc.AudioFrame]:
+    """
+    tts_node for agents that speak long answers: the first clause is synthesized as
+    soon as it is complete, then one sentence at a time, with markdown stripped as
+    the text streams. With TTS_EARLY_FLUSH off the default tts_node is used, still
+    timed, so the first_audio stage compares the two.
+    """
+    if not settings.TTS_EARLY_FLUSH:
+        audio_fn = lambda timed: Agent.default.tts_node(agent, timed, model_settings)
+    else:
+        audio_fn = lambda timed: synthesize_segments(
+            agent.tts,
+            segment_speech(
+                timed,
+                first_min_words=settings.TTS_FIRST_CHUNK_MIN_WORDS,
+                first_max_words=settings.TTS_FIRST_CHUNK_MAX_WORDS,
+                min_sentence_chars=settings.TTS_MIN_SENTENCE_CHARS,
+            ),
+            max_ahead=settings.TTS_SEGMENTS_AHEAD,
+        )
+    async for frame in _time_first_audio(agent, text, audio_fn):
+        yield frame
@@ -0,0 +1,153 @@
+import re
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+_SENTENCE_END_RE = re.compile(r"[.!?]+[\"')\]]*\s")
+_CLAUSE_END_RE = re.compile(r"[,;:]\s")
+_WORD_RE = re.compile(r"\S+\s")
+_LAST_WORD_RE = re.compile(r"[\"'(\[]*(\S+)$")
+# initialisms like "U.S" or "e.g", seen without their final period
+_DOTTED_RE = re.compile(r"(?:[A-Za-z]\.)+[A-Za-z]")
+# a period after these rarely ends the sentence
+_ABBREVIATIONS = frozenset(
+    "mr mrs ms dr prof sr jr st mt vs etc inc ltd corp approx dept est "
+    "jan feb mar apr jun jul aug sep sept oct nov dec".split()
+)
+
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_EMPHASIS_RE = re.compile(r"\*\*|__|~~|[*`]")
+_LINE_MARKER_RE = re.compile(r"^\s*(?:#{1,6}\s*|>\s?|[-*+]\s+)")
+_RULE_RE = re.compile(r"^\s*(?:[-*_]\s*){3,}$")
+_TABLE_SEPARATOR_CELL_RE = re.compile(r"^:?-{2,}:?$")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def clean_markdown(text: str, line_start: bool) -> str:
+    """Drop markdown the TTS would read out or stumble on, keeping the spoken words."""
+    if line_start:
+        stripped = text.strip()
+        if stripped.startswith("|"):
+            cells = [cell.strip() for cell in stripped.strip("|").split("|")]
+            if all(_TABLE_SEPARATOR_CELL_RE.match(cell) for cell in cells if cell):
+                return ""
+            text = ", ".join(cell for cell in cells if cell) + "."
+        elif _RULE_RE.match(text):
+            return ""
+        else:
+            text = _LINE_MARKER_RE.sub("", text)
+    text = _IMAGE_RE.sub("", text)
+    text = _LINK_RE.sub(r"\1", text)
+    text = _HTML_TAG_RE.sub("", text)
+    text = _EMPHASIS_RE.sub("", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class SpeechSegmenter:
+    """
+    Splits streamed LLM text into segments for TTS, cleaning markdown as it goes.
+
+    The first segment is flushed early, at the first clause break once it has
+    `first_min_words` words or after `first_max_words` words, so synthesis starts
+    before the first sentence is complete. Later segments end at sentence breaks
+    once they are `min_sentence_chars` long; periods of abbreviations and initials
+    ("Mr.", "J.", "U.S.") are not sentence breaks, and a first segment ending at a
+    sentence break has at least two words. Line breaks always end a segment; table
+    rows are held until complete and read as comma-separated cells, and code blocks
+    are dropped.
+    """
+
+    def __init__(self, first_min_words: int, first_max_words: int, min_sentence_chars: int):
+        self.first_min_words = first_min_words
+        self.first_max_words = first_max_words
+        self.min_sentence_chars = min_sentence_chars
+        self._buffer = ""
+        self._line_start = True
+        self._in_code_block = False
+        self._emitted = 0
+
+    def push(self, text: str) -> List[str]:
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return segments
+            segment = self._take(cut)
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> List[str]:
+        if not self._buffer:
+            return []
+        segment = self._take(len(self._buffer))
+        return [segment] if segment else []
+
+    def _take(self, cut: int) -> Optional[str]:
+        raw, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        line_start, self._line_start = self._line_start, raw.endswith("\n")
+        if line_start and raw.strip().startswith("```"):
+            self._in_code_block = not self._in_code_block
+            return None
+        if self._in_code_block:
+            return None
+        segment = clean_markdown(raw, line_start)
+        if segment:
+            self._emitted += 1
+        return segment
+
+    def _next_cut(self) -> Optional[int]:
+        newline = self._buffer.find("\n")
+        line_end = newline + 1 if newline >= 0 else None
+        if self._line_start:
+            head = self._buffer.lstrip(" \t")
+            # could still turn out to be a code fence or a table row, which only make sense whole
+            if self._in_code_block or head.startswith(("`", "|")) or head in ("", "-", "*"):
+                return line_end
+
+        cuts = [line_end] if line_end is not None else []
+        for match in _SENTENCE_END_RE.finditer(self._buffer):
+            if self._is_abbreviation(match):
+                continue
+            if self._emitted == 0 and len(_WORD_RE.findall(self._buffer[:match.end()])) < 2:
+                continue
+            if self._emitted == 0 or match.end() >= self.min_sentence_chars:
+                cuts.append(match.end())
+                break
+        if self._emitted == 0:
+            words = list(_WORD_RE.finditer(self._buffer))
+            for match in _CLAUSE_END_RE.finditer(self._buffer):
+                if sum(1 for word in words if word.end() <= match.end()) >= self.first_min_words:
+                    cuts.append(match.end())
+                    break
+            if len(words) >= self.first_max_words:
+                cuts.append(words[self.first_max_words - 1].end())
+        return min(cuts) if cuts else None
+
+    def _is_abbreviation(self, match: re.Match) -> bool:
+        if match.group().strip() != ".":
+            return False
+        word = _LAST_WORD_RE.search(self._buffer[:match.start()])
+        if word is None:
+            return False
+        word = word.group(1)
+        return (
+            word.lower() in _ABBREVIATIONS
+            or (len(word) == 1 and word.isalpha())
+            or _DOTTED_RE.fullmatch(word) is not None
+        )
+
+
+async def segment_speech(
+    text: AsyncIterable[str],
+    first_min_words: int,
+    first_max_words: int,
+    min_sentence_chars: int,
+) -> AsyncIterator[str]:
+    """Yield TTS segments of a text stream as soon as each one is complete."""
+    segmenter = SpeechSegmenter(first_min_words, first_max_words, min_sentence_chars)
+    async for chunk in text:
+        for segment in segmenter.push(chunk):
+            yield segment
+    for segment in segmenter.flush():
+        yield segment
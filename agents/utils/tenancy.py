@@ -0,0 +1,37 @@
+import json
+import logging
+from typing import Optional
+
+from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters
+
+logger = logging.getLogger(__name__)
+
+
+def tenant_key(user_id: str) -> str:
+    """
+    Name identifying a user's data in the shared collection, matching the ingestion
+    API. Index version stamps are written per tenant key.
+    """
+    return f"embedding_store_{user_id}"
+
+
+def tenant_filters(user_id: str, project_id: Optional[str] = None) -> MetadataFilters:
+    """
+    Filters restricting retrieval to one user's (and project's) nodes in the shared
+    collection. ChromaVectorStore pushes them down to Chroma as a `where` clause.
+    """
+    filters = [MetadataFilter(key="user_id", value=user_id)]
+    if project_id:
+        filters.append(MetadataFilter(key="project_id", value=project_id))
+    return MetadataFilters(filters=filters)
+
+
+def project_from_metadata(metadata: Optional[str]) -> Optional[str]:
+    """Read the projectId the frontend puts in the participant metadata, if any."""
+    if not metadata:
+        return None
+    try:
+        return json.loads(metadata).get("projectId")
+    except (ValueError, AttributeError):
+        logger.warning(f"participant metadata is not a JSON object: {metadata}")
+        return None
@@ -0,0 +1,158 @@
+import os
+import json
+import logging
+from typing import Any, List, Optional
+
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FNAME = "vectors.npy"
+VECTOR_IDS_FNAME = "vector_ids.json"
+# written by llama_index's SimpleVectorStore, migrated on first load
+LEGACY_VECTOR_STORE_FNAME = "default__vector_store.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _atomic_write(path: str, write_fn) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store persisted as a float32 `.npy` matrix plus an id table.
+
+    The matrix is memory-mapped on load, so job processes share the OS page cache
+    instead of each parsing JSON into Python lists, and top-k search is a single
+    NumPy matrix-vector product. Rows are L2-normalized, so the dot product is the
+    cosine similarity SimpleVectorStore used. Node text lives in the docstore.
+    """
+
+    stores_text: bool = False
+
+    _matrix: np.ndarray = PrivateAttr()
+    _ids: List[str] = PrivateAttr()
+    _ref_doc_ids: List[str] = PrivateAttr()
+
+    def __init__(
+        self,
+        matrix: Optional[np.ndarray] = None,
+        ids: Optional[List[str]] = None,
+        ref_doc_ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._matrix = matrix if matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        self._ids = list(ids or [])
+        self._ref_doc_ids = list(ref_doc_ids or [])
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "MmapVectorStore":
+        """Memory-map a persisted store, migrating a legacy JSON store first if needed."""
+        vectors_path = os.path.join(persist_dir, VECTORS_FNAME)
+        ids_path = os.path.join(persist_dir, VECTOR_IDS_FNAME)
+        if not os.path.exists(vectors_path) or not os.path.exists(ids_path):
+            cls.migrate_json_store(persist_dir)
+
+        with open(ids_path, "r") as f:
+            id_table = json.load(f)
+        matrix = np.load(vectors_path, mmap_mode="r")
+        return cls(matrix=matrix, ids=id_table["ids"], ref_doc_ids=id_table["ref_doc_ids"])
+
+    @classmethod
+    def migrate_json_store(cls, persist_dir: str) -> None:
+        """Convert a SimpleVectorStore `default__vector_store.json` into the `.npy` format."""
+        legacy_path = os.path.join(persist_dir, LEGACY_VECTOR_STORE_FNAME)
+        if not os.path.exists(legacy_path):
+            raise ValueError(f"No vector store found in {persist_dir}")
+
+        logger.info(f"Migrating {legacy_path} to {VECTORS_FNAME}")
+        with open(legacy_path, "r") as f:
+            data = json.load(f)
+        ids = list(data["embedding_dict"].keys())
+        ref_doc_ids = [data["text_id_to_ref_doc_id"].get(node_id, "None") for node_id in ids]
+        matrix = np.asarray([data["embedding_dict"][node_id] for node_id in ids], dtype=np.float32)
+        cls(matrix=_normalize_rows(matrix), ids=ids, ref_doc_ids=ref_doc_ids).persist(legacy_path)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        rows = _normalize_rows(np.asarray([node.get_embedding() for node in nodes], dtype=np.float32))
+        if self._matrix.size == 0:
+            self._matrix = rows
+        else:
+            self._matrix = np.vstack([self._matrix, rows])
+        self._ids.extend(node.node_id for node in nodes)
+        self._ref_doc_ids.extend(node.ref_doc_id or "None" for node in nodes)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keep = [i for i, doc_id in enumerate(self._ref_doc_ids) if doc_id != ref_doc_id]
+        if len(keep) == len(self._ids):
+            return
+        self._matrix = np.asarray(self._matrix[keep], dtype=np.float32)
+        self._ids = [self._ids[i] for i in keep]
+        self._ref_doc_ids = [self._ref_doc_ids[i] for i in keep]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("MmapVectorStore does not store metadata and cannot apply filters.")
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Unsupported query mode for MmapVectorStore: {query.mode}")
+        if query.query_embedding is None or not self._ids:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        rows = np.arange(len(self._ids))
+        if query.node_ids is not None:
+            wanted = set(query.node_ids)
+            rows = np.asarray([i for i, node_id in enumerate(self._ids) if node_id in wanted], dtype=int)
+            if rows.size == 0:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+        matrix = self._matrix if rows.size == len(self._ids) else self._matrix[rows]
+
+        query_vector = np.asarray(query.query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm > 0:
+            query_vector /= norm
+        scores = matrix @ query_vector
+
+        top_k = min(query.similarity_top_k, scores.shape[0])
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return VectorStoreQueryResult(
+            similarities=scores[top].tolist(),
+            ids=[self._ids[rows[i]] for i in top],
+        )
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Write the matrix and id table next to `persist_path` (the StorageContext vector store path)."""
+        persist_dir = os.path.dirname(persist_path)
+        os.makedirs(persist_dir, exist_ok=True)
+        matrix = np.ascontiguousarray(self._matrix, dtype=np.float32)
+        _atomic_write(os.path.join(persist_dir, VECTORS_FNAME), lambda f: np.save(f, matrix))
+        id_table = json.dumps({"ids": self._ids, "ref_doc_ids": self._ref_doc_ids})
+        _atomic_write(os.path.join(persist_dir, VECTOR_IDS_FNAME), lambda f: f.write(id_table.encode("utf-8")))
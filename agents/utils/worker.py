@@ -0,0 +1,87 @@
+import time
+import logging
+import threading
+from typing import Awaitable, Callable, Optional
+
+import psutil
+from livekit.agents import JobContext, WorkerOptions
+from config import settings
+from .prewarm import prewarm
+from .latency import serve_latency_metrics
+
+logger = logging.getLogger(__name__)
+
+# How often the worker calls load_fnc (livekit.agents.worker.UPDATE_LOAD_INTERVAL).
+LOAD_UPDATE_INTERVAL = 2.5
+# Weight of the newest sample in the smoothed event loop lag.
+LOOP_LAG_SMOOTHING = 0.5
+
+
+class WorkerLoadMonitor:
+    """
+    Load reported to the LiveKit dispatcher, in [0, 1].
+
+    The worker calls `__call__` from a thread every LOAD_UPDATE_INTERVAL seconds,
+    scheduled from its event loop, so how late a call arrives is the loop's lag.
+    Load is the highest of: live sessions against WORKER_MAX_SESSIONS, CPU use
+    (VAD and turn detection run in the job processes) and loop lag against
+    WORKER_MAX_LOOP_LAG_SECONDS. The worker stops taking jobs once it reaches
+    `load_threshold`, so new sessions go to less loaded workers first.
+    """
+
+    def __init__(self, max_sessions: int, max_loop_lag: float):
+        self.max_sessions = max_sessions
+        self.max_loop_lag = max_loop_lag
+        self.loop_lag = 0.0
+        self._last_call: Optional[float] = None
+        self._lock = threading.Lock()
+        # primes the counter, psutil measures CPU between consecutive calls
+        psutil.cpu_percent(interval=None)
+
+    def __call__(self, worker) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if self._last_call is not None:
+                lag = max(0.0, now - self._last_call - LOAD_UPDATE_INTERVAL)
+                self.loop_lag = LOOP_LAG_SMOOTHING * lag + (1 - LOOP_LAG_SMOOTHING) * self.loop_lag
+            self._last_call = now
+
+        sessions = len(worker.active_jobs)
+        cpu = psutil.cpu_percent(interval=None) / 100.0
+        load = max(
+            sessions / self.max_sessions,
+            cpu,
+            self.loop_lag / self.max_loop_lag,
+        )
+        logger.debug(
+            f"worker load {load:.2f}: {sessions} sessions, cpu {cpu:.2f}, loop lag {self.loop_lag * 1000:.0f}ms"
+        )
+        return min(1.0, load)
+
+
+def getWorkerOptions(
+    entrypoint_fnc: Callable[[JobContext], Awaitable[None]],
+    agent_name: str,
+    **kwargs,
+) -> WorkerOptions:
+    """
+    WorkerOptions shared by every agent entry point: prewarmed job processes and
+    load reporting that spreads sessions across workers before latency degrades.
+    Keyword arguments override the defaults. Also starts the turn latency scrape
+    endpoint when LATENCY_METRICS_PORT is set.
+    """
+    if settings.LATENCY_METRICS_PORT:
+        serve_latency_metrics(settings.LATENCY_METRICS_PORT, settings.LATENCY_METRICS_DIR)
+    options = dict(
+        entrypoint_fnc=entrypoint_fnc,
+        prewarm_fnc=prewarm,
+        agent_name=agent_name,
+        load_fnc=WorkerLoadMonitor(
+            max_sessions=settings.WORKER_MAX_SESSIONS,
+            max_loop_lag=settings.WORKER_MAX_LOOP_LAG_SECONDS,
+        ),
+        load_threshold=settings.WORKER_LOAD_THRESHOLD,
+        num_idle_processes=settings.WORKER_IDLE_PROCESSES,
+    )
+    options.update(kwargs)
+    return WorkerOptions(**options)
@@ -1,23 +1,20 @@
 import logging
-from utils import getAzureSTTModel,getAzureLLMModel,getAzureTTSModel
+from utils import getPrewarmedModels, getWorkerOptions, attach_session_metrics, say_phrase
+from config import settings
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import (
     Agent,
     AgentSession,
     AutoSubscribe,
     JobContext,
-    JobProcess,
-    WorkerOptions,
     cli,
-    metrics,
     RoomInputOptions,
 )
-from livekit.plugins import silero
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
 logger = logging.getLogger("voice-agent")
 
 class VoiceAssistant(Agent):
-    def __init__(self) -> None:
+    def __init__(self, models: dict) -> None:
         # This project is configured to use Deepgram STT, OpenAI LLM and Cartesia TTS plugins
         # Other great providers exist like Cerebras, ElevenLabs, Groq, Play.ht, Rime, and more
         # Learn more and pick the best one for your app:
@@ -27,9 +24,9 @@ class VoiceAssistant(Agent):
             instructions="You are a voice assistant created by LiveKit. Your interface with users will be voice. "
             "You should use short and concise responses, and avoiding usage of unpronouncable punctuation. "
             "You were created as a demo to showcase the capabilities of LiveKit's agents framework.",
-            stt=getAzureSTTModel(),
-            llm=getAzureLLMModel(),
-            tts=getAzureTTSModel(),
+            stt=models["stt"],
+            llm=models["llm"],
+            tts=models["tts"],
             # use LiveKit's transformer-based turn detector
             turn_detection=MultilingualModel(),
         )
@@ -48,13 +45,8 @@ class VoiceAssistant(Agent):
 
     async def on_enter(self):
         # The agent should be polite and greet the user when it joins :)
-        self.session.generate_reply(
-            instructions="Hey, how can I help you today?", allow_interruptions=True
-        )
-
-
-def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+        # a fixed greeting plays from the phrase audio cache instead of waiting on the LLM and TTS
+        say_phrase(self.session, self.tts, settings.AGENT_GREETING, allow_interruptions=True)
 
 
 async def entrypoint(ctx: JobContext):
@@ -65,27 +57,22 @@ async def entrypoint(ctx: JobContext):
     participant = await ctx.wait_for_participant()
     logger.info(f"starting voice assistant for participant {participant.identity}")
 
-    usage_collector = metrics.UsageCollector()
-
-    # Log metrics and collect usage data
-    def on_metrics_collected(agent_metrics: metrics.AgentMetrics):
-        metrics.log_metrics(agent_metrics)
-        usage_collector.collect(agent_metrics)
+    models = getPrewarmedModels(ctx.proc)
 
     session = AgentSession(
-        vad=ctx.proc.userdata["vad"],
+        vad=models["vad"],
         # minimum delay for endpointing, used when turn detector believes the user is done with their turn
         min_endpointing_delay=0.5,
         # maximum delay for endpointing, used when turn detector does not believe the user is done with their turn
         max_endpointing_delay=5.0,
     )
 
-    # Trigger the on_metrics_collected function when metrics are collected
-    session.on("metrics_collected", on_metrics_collected)
+    # Log metrics, usage and the per-turn latency breakdown
+    attach_session_metrics(ctx, session)
 
     await session.start(
         room=ctx.room,
-        agent=VoiceAssistant(),
+        agent=VoiceAssistant(models),
         room_input_options=RoomInputOptions(
             # enable background voice & noise cancellation, powered by Krisp
             # included at no additional cost with LiveKit Cloud
@@ -96,9 +83,8 @@ async def entrypoint(ctx: JobContext):
 
 if __name__ == "__main__":
     cli.run_app(
-        WorkerOptions(
-            entrypoint_fnc=entrypoint,
-            prewarm_fnc=prewarm,
+        getWorkerOptions(
+            entrypoint,
             agent_name="voice-assistant-agent",
         ),
     )
\ No newline at end of file
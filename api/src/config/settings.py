@@ -5,6 +5,19 @@ class Settings(BaseSettings):
     LIVEKIT_HOST: str
     LIVEKIT_API_KEY: str
     LIVEKIT_API_SECRET: str
+    # pooled server API client
+    LIVEKIT_API_MAX_CONNECTIONS: int = 100
+    LIVEKIT_API_KEEPALIVE_SECONDS: float = 60.0
+    LIVEKIT_API_TIMEOUT_SECONDS: float = 10.0
+    # /check results are shared by all pollers of a room for this long
+    ROOM_STATE_CACHE_TTL_SECONDS: float = 1.0
+    ROOM_STATE_CACHE_MAX_ENTRIES: int = 10000
+    # join tokens are reused until they are this close to expiry
+    TOKEN_TTL_SECONDS: int = 6 * 60 * 60
+    TOKEN_REFRESH_MARGIN_SECONDS: int = 15 * 60
+    TOKEN_CACHE_MAX_ENTRIES: int = 100000
+    # users per /create-rooms call
+    TOKEN_BATCH_MAX_SIZE: int = 1000
 
     # Inference Settings
     INFERENCE_API_ENDPOINT: str
@@ -21,5 +34,47 @@ class Settings(BaseSettings):
     # Agent Settings
     AGENT_INSTRUCTIONS: str = "You are a helpful voice AI assistant."
 
+    # Vector Store Settings
+    # Chroma server the ingestion workers write to; empty opens ./chroma_db in each worker,
+    # with writes serialized by a file lock. Use a server with more than one ingestion worker.
+    CHROMA_HOST: str = ""
+    CHROMA_PORT: int = 8000
+    # one collection for all users, queries are filtered by user_id and project_id
+    CHROMA_COLLECTION: str = "embedding_store"
+    # HNSW graph degree and build/search beam widths, applied when the collection is created
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 100
+    HNSW_EF_SEARCH: int = 64
+
+    # Ingestion Settings
+    # inputs per embedding request, Azure accepts up to 2048 but also caps total tokens per request
+    EMBED_BATCH_SIZE: int = 128
+    EMBED_MAX_CONCURRENCY: int = 4
+    EMBED_MAX_RETRIES: int = 6
+    # concurrent LLM calls per metadata extractor (summary, questions answered)
+    EXTRACTION_CONCURRENCY: int = 8
+    # processes partitioning PDF, Word and Excel files, per ingestion worker
+    PARSING_WORKERS: int = 4
+    # "hi_res" detects table structure, "fast" skips layout detection
+    PDF_PARTITION_STRATEGY: str = "hi_res"
+    # unstructured chunk size, below the 1024-token splitter chunks so tables stay whole
+    PARSING_MAX_CHARACTERS: int = 4000
+    # documents (parsed chunks) per streamed batch through extraction, embedding and storage
+    INGESTION_DOCUMENT_BATCH_SIZE: int = 32
+    # batches loaded ahead of the one being processed, bounds memory for large uploads
+    INGESTION_PREFETCH_BATCHES: int = 1
+    # durable job queue drained by a pool of worker processes
+    INGESTION_QUEUE_PATH: str = "./ingestion_jobs.sqlite3"
+    INGESTION_WORKERS: int = 2
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_SECONDS: float = 30.0
+    INGESTION_POLL_INTERVAL_SECONDS: float = 1.0
+    # a running job is requeued if its worker does not renew the lease for this long
+    INGESTION_LEASE_SECONDS: float = 60.0
+    # finished submissions stay queryable this long after their last update
+    INGESTION_STATUS_TTL_SECONDS: float = 86400.0
+    # upper bound for the long-poll status route
+    INGESTION_STATUS_MAX_WAIT_SECONDS: float = 30.0
+
     class Config:
         env_file = ".env"
\ No newline at end of file
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import random
+from typing import Callable, List, Optional, Sequence
+
+import openai
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit that halves on every 429 and grows back by one
+    after `increase_after` consecutive successful requests (AIMD).
+    """
+
+    def __init__(self, max_concurrency: int, increase_after: int = 5):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.increase_after = increase_after
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.increase_after and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+
+    def on_rate_limited(self) -> None:
+        self._successes = 0
+        self.limit = max(1, self.limit // 2)
+        logger.warning(f"Embedding requests rate limited, concurrency lowered to {self.limit}")
+
+
+class BatchEmbedder:
+    """
+    Embeds nodes in batches of `batch_size` inputs with a bounded, adaptive number
+    of concurrent requests, so ingestion is limited by quota instead of round trips.
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        batch_size: int,
+        max_concurrency: int,
+        max_retries: int,
+    ):
+        self.embed_model = embed_model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+    async def embed_nodes(
+        self,
+        nodes: Sequence[BaseNode],
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ) -> Sequence[BaseNode]:
+        """Set `embedding` on every node that does not have one yet."""
+        pending = [node for node in nodes if node.embedding is None]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        # created per call, asyncio primitives are bound to the loop that first uses them
+        limiter = AdaptiveConcurrencyLimiter(self.max_concurrency)
+
+        async def embed_batch(batch: List[BaseNode]) -> None:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+            embeddings = await self._embed_with_retry(texts, limiter)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+            if progress_callback is not None:
+                progress_callback(len(batch))
+
+        tasks = [asyncio.create_task(embed_batch(batch)) for batch in batches]
+        try:
+            # a failed batch fails the call, the others would only spend quota on nodes never stored
+            done = (await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION))[0] if tasks else ()
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+        return nodes
+
+    async def _embed_with_retry(
+        self,
+        texts: List[str],
+        limiter: AdaptiveConcurrencyLimiter
+    ) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            async with limiter:
+                try:
+                    embeddings = await self.embed_model.aget_text_embedding_batch(texts)
+                    limiter.on_success()
+                    return embeddings
+                except _RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._retry_delay(e, attempt)
+                    error_name = e.__class__.__name__
+                    if isinstance(e, openai.RateLimitError):
+                        limiter.on_rate_limited()
+            logger.warning(f"Embedding batch failed ({error_name}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 2 ** attempt) + random.uniform(0, 1)
@@ -1,4 +1,4 @@
-from typing import List, Optional, Tuple
+from typing import AsyncIterator, Callable, List, Optional, Tuple
 from llama_index.core import SimpleDirectoryReader, Document
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.extractors import (
@@ -10,12 +10,63 @@ from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core import StorageContext, VectorStoreIndex
 import chromadb
 import logging
-from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.ingestion import IngestionPipeline, IngestionCache, DocstoreStrategy
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from llama_index.core.schema import MetadataMode
 from utils import getAzureLLMIndexModel, getAzureLLMIndexEmbeddingModel
+from config import settings
+from .embedding import BatchEmbedder
+from .parsing import DocumentParser
+from .sparse_index import SparseIndexWriter
+import asyncio
+import hashlib
+import fcntl
 import os
+import uuid
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# Read by the voice agents' index cache to drop indexes that were re-ingested.
+INDEX_VERSION_DIR = "index_versions"
+# Per-collection docstore and transformation cache used to skip unchanged files.
+PIPELINE_STORAGE_DIR = "ingestion"
+# Held by an ingestion worker while it writes to Chroma or persists its pipeline storage.
+CHROMA_WRITE_LOCK = ".write.lock"
+# Reader metadata that changes without the file content changing, kept out of the document hash.
+VOLATILE_METADATA_KEYS = ("creation_date", "last_modified_date", "last_accessed_date")
+
+
+def tenant_key(user_id: str) -> str:
+    """
+    Name identifying a user's data in the shared collection. Version stamps and the
+    per-user pipeline storage are keyed by it (it was the per-user collection name).
+    """
+    return f"embedding_store_{user_id}"
+
+
+class InvalidIngestionInput(ValueError):
+    """The request itself is unusable (missing files, nothing to ingest), retrying cannot help."""
+
+
+def scoped_doc_id(user_id: str, project_id: str, doc_id: str) -> str:
+    """
+    Doc id unique across tenants. A changed document's earlier nodes are deleted from
+    the shared collection by doc id alone (see `replace_nodes`), so ids must not collide
+    between users, nor between projects of one user.
+    """
+    prefix = f"{user_id}/{project_id}/"
+    return doc_id if doc_id.startswith(prefix) else f"{prefix}{doc_id}"
+
+
+def file_content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 class DataIngestionPipeline:
     def __init__(
         self,
@@ -24,9 +75,28 @@ class DataIngestionPipeline:
         self.llm = getAzureLLMIndexModel()
         self.embed_model = getAzureLLMIndexEmbeddingModel()
         self.chroma_persist_dir = chroma_persist_dir
+        # one request per batch, retries are handled by the embedder so it can back off on 429s
+        self.embedder = BatchEmbedder(
+            getAzureLLMIndexEmbeddingModel(embed_batch_size=settings.EMBED_BATCH_SIZE, max_retries=0),
+            batch_size=settings.EMBED_BATCH_SIZE,
+            max_concurrency=settings.EMBED_MAX_CONCURRENCY,
+            max_retries=settings.EMBED_MAX_RETRIES,
+        )
+        
+        # PDF, Word and Excel files are partitioned in a process pool
+        self.parser = DocumentParser(
+            max_workers=settings.PARSING_WORKERS,
+            pdf_strategy=settings.PDF_PARTITION_STRATEGY,
+            max_characters=settings.PARSING_MAX_CHARACTERS,
+        )
         
         # Initialize ChromaDB
-        self.chroma_client = chromadb.PersistentClient(path=chroma_persist_dir)
+        if settings.CHROMA_HOST:
+            self.chroma_client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+        else:
+            self.chroma_client = chromadb.PersistentClient(path=chroma_persist_dir)
+        # BM25 term statistics the voice agents fuse with vector results
+        self.sparse_index = SparseIndexWriter(chroma_persist_dir)
         # self.chroma_client  = chromadb.Client(chromadb.config.Settings(
         #                                 chroma_db_impl="duckdb+parquet",
         #                                 persist_directory=chroma_persist_dir
@@ -37,11 +107,31 @@ class DataIngestionPipeline:
             chunk_size=1024,
             chunk_overlap=128
         )
-        self.summary_extractor = SummaryExtractor(llm=self.llm, nodes=5)
-        self.qa_extractor = QuestionsAnsweredExtractor(llm=self.llm, questions=3)
+        # num_workers bounds the concurrent LLM calls each extractor makes across nodes
+        self.summary_extractor = SummaryExtractor(
+            llm=self.llm,
+            nodes=5,
+            num_workers=settings.EXTRACTION_CONCURRENCY
+        )
+        self.qa_extractor = QuestionsAnsweredExtractor(
+            llm=self.llm,
+            questions=3,
+            num_workers=settings.EXTRACTION_CONCURRENCY
+        )
 
-    async def create_pipeline_with_llamindex(self,add_processes: bool = True) -> IngestionPipeline:
-        """Create the ingestion pipeline."""
+    async def create_pipeline_with_llamindex(
+        self,
+        add_processes: bool = True,
+        user_id: Optional[str] = None
+    ) -> IngestionPipeline:
+        """
+        Create the ingestion pipeline.
+
+        With a user_id the pipeline is incremental: its docstore, kept per user, skips
+        documents whose content hash was already ingested for the user, and its cache reuses
+        transformation outputs. The pipeline never writes to Chroma itself; `store_documents`
+        replaces the nodes of changed documents by (user scoped) doc id under the write lock.
+        """
         try:
         # Apply transformations pipeline
             pipeline_transformations = [self.text_splitter]
@@ -52,13 +142,92 @@ class DataIngestionPipeline:
                     self.qa_extractor
                 ])
 
-            pipeline = IngestionPipeline(transformations=pipeline_transformations)
+            if user_id is None:
+                return IngestionPipeline(transformations=pipeline_transformations)
+
+            pipeline = IngestionPipeline(
+                transformations=pipeline_transformations,
+                docstore=SimpleDocumentStore(),
+                # changed documents are rerun, their old nodes are deleted when the new ones are stored
+                docstore_strategy=DocstoreStrategy.DUPLICATES_ONLY,
+                cache=IngestionCache(),
+            )
+            persist_dir = self.pipeline_persist_dir(user_id)
+            if os.path.exists(persist_dir):
+                pipeline.load(persist_dir)
             
             return pipeline
         except Exception as e:
             logger.error(f"Error creating pipeline: {e}")
             return None
-            
+
+    def get_collection(self):
+        """
+        The collection shared by all users, each node tagged with its user_id and project_id.
+        HNSW parameters only take effect when the collection is created.
+        """
+        with self.chroma_write_lock():
+            return self.chroma_client.get_or_create_collection(
+                name=settings.CHROMA_COLLECTION,
+                metadata={
+                    "hnsw:M": settings.HNSW_M,
+                    "hnsw:construction_ef": settings.HNSW_EF_CONSTRUCTION,
+                    "hnsw:search_ef": settings.HNSW_EF_SEARCH,
+                },
+            )
+
+    @contextmanager
+    def chroma_write_lock(self):
+        """
+        Exclusive across the ingestion worker processes, which share one Chroma directory and
+        the pipeline storage beside it. Not reentrant, never nest it.
+        """
+        os.makedirs(self.chroma_persist_dir, exist_ok=True)
+        with open(os.path.join(self.chroma_persist_dir, CHROMA_WRITE_LOCK), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def pipeline_persist_dir(self, user_id: str) -> str:
+        return os.path.join(self.chroma_persist_dir, PIPELINE_STORAGE_DIR, tenant_key(user_id))
+
+    async def persist_pipeline(self, user_id: str, pipeline: IngestionPipeline) -> None:
+        """Persist the docstore and cache, only once the nodes they describe are stored."""
+        def persist() -> None:
+            with self.chroma_write_lock():
+                pipeline.persist(self.pipeline_persist_dir(user_id))
+
+        await asyncio.to_thread(persist)
+
+    def resolve_input_files(self, input_dir: str, input_files: Optional[List[str]] = None) -> List[str]:
+        """Validate the upload location and return the full paths of the requested files."""
+        # Ensure input_dir exists
+        if not os.path.exists(input_dir):
+            raise InvalidIngestionInput(f"Directory does not exist: {input_dir}")
+
+        # Validate files exist if specified
+        files_list = list()
+        if input_files:
+            for file in input_files:
+                full_path = os.path.join(input_dir, file)
+                if not os.path.exists(full_path):
+                    raise InvalidIngestionInput(f"File not found: {full_path}")
+                files_list.append(full_path)
+        return files_list
+
+    def prepare_documents(self, documents: List[Document]) -> List[Document]:
+        """Key documents by file content, not by when the file was touched."""
+        file_hashes = {}
+        for doc in documents:
+            file_path = doc.metadata.get("file_path")
+            if file_path and file_path not in file_hashes:
+                file_hashes[file_path] = file_content_hash(file_path)
+            for key in VOLATILE_METADATA_KEYS:
+                doc.metadata.pop(key, None)
+            doc.metadata["file_hash"] = file_hashes.get(file_path, "")
+            doc.excluded_embed_metadata_keys.append("file_hash")
+            doc.excluded_llm_metadata_keys.append("file_hash")
+        return documents
+
     async def load_documents_with_llamaindex(
         self,
         input_dir: str,
@@ -66,39 +235,58 @@ class DataIngestionPipeline:
     ) -> List[Document]:
         """Load documents from directory."""
         try:
-                   # Ensure input_dir exists
-            if not os.path.exists(input_dir):
-                raise ValueError(f"Directory does not exist: {input_dir}")
-
-            # Validate files exist if specified
-            files_list = list()
-            if input_files:
-                for file in input_files:
-                    full_path = os.path.join(input_dir, file)
-                    if not os.path.exists(full_path):
-                        raise ValueError(f"File not found: {full_path}")
-                    files_list.append(full_path)
-
-           
+            files_list = self.resolve_input_files(input_dir, input_files)
             print(f"Loading documents from {input_dir} with files: {input_files}")
             reader = SimpleDirectoryReader(
                 input_dir=input_dir,
                 input_files=files_list,
                 filename_as_id=True
             )
-            return reader.load_data()
+            documents = await asyncio.to_thread(reader.load_data)
+            return self.prepare_documents(documents)
         except Exception as e:
             logger.error(f"Error loading documents: {e}")
             raise
 
+    async def iter_document_batches(
+        self,
+        input_dir: str,
+        input_files: Optional[List[str]] = None,
+        batch_size: int = 32
+    ) -> AsyncIterator[List[Document]]:
+        """
+        Parse documents one file at a time and yield them in batches of at most `batch_size`,
+        so only the files being parsed and the batches in flight are held in memory.
+        """
+        try:
+            files_list = self.resolve_input_files(input_dir, input_files)
+            if not files_list:
+                # the whole directory, with SimpleDirectoryReader's file selection rules
+                files_list = [str(path) for path in SimpleDirectoryReader(input_dir=input_dir).input_files]
+            print(f"Streaming documents from {input_dir} with files: {input_files}")
+        except Exception as e:
+            logger.error(f"Error loading documents: {e}")
+            raise
+
+        pending: List[Document] = []
+        async for file_documents in self.parser.iter_files(files_list):
+            pending.extend(self.prepare_documents(file_documents))
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                pending = pending[batch_size:]
+        if pending:
+            yield pending
+
     async def process_documents(
         self,
+        user_id: str,
         project_id: str,
         project_name: str,
         documents: List[Document],
-        pipeline: IngestionPipeline 
+        pipeline: IngestionPipeline,
+        progress_callback: Optional[Callable[[str, int], None]] = None
     ) -> Tuple[bool, List[Document]]:
-        """Process and transform documents."""
+        """Process and transform documents. `progress_callback(stage, count)` receives node counts."""
         try:
             if not pipeline:
                 logger.error("Pipeline is not initialized.")
@@ -110,13 +298,20 @@ class DataIngestionPipeline:
             for docs in documents:
                 docs.metadata["project_id"]=project_id
                 docs.metadata["project_name"]=project_name
+                # scope doc ids to the user and project, upserts delete other nodes by doc id
+                docs.id_ = scoped_doc_id(user_id, project_id, docs.id_)
 
-            # Run the pipeline on the documents 
-            nodes = pipeline.run(
+            # Run the pipeline on the documents without blocking the event loop,
+            # extractor LLM calls run concurrently up to EXTRACTION_CONCURRENCY
+            nodes = await pipeline.arun(
                 documents=documents,
                 in_place=True,
                 show_progress=True
             )
+            if progress_callback is not None:
+                # the extractors annotate nodes one to one, so both stages see the same count
+                progress_callback("nodes_chunked", len(nodes))
+                progress_callback("nodes_extracted", len(nodes))
             return True, nodes
         except Exception as e:
             logger.error(f"Error processing documents: {e}")
@@ -126,33 +321,33 @@ class DataIngestionPipeline:
         self,
         user_id: str,
         nodes: List[Document],
-        overwrite: bool = False
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[str, int], None]] = None
     ) -> bool:
-        """Store documents in vector store."""
-        collection_name = "embedding_store"
-        collection_name = f"{collection_name}_{user_id}"
-        print(f"Storing documents in collection: {collection_name}")
+        """Store documents in vector store. `progress_callback(stage, count)` receives node counts."""
+        collection_name = tenant_key(user_id)
+        print(f"Storing documents for {collection_name} in collection: {settings.CHROMA_COLLECTION}")
 
         try:
-            if overwrite:
-                self.chroma_client.delete_collection(collection_name)
-                collection = self.chroma_client.create_collection(collection_name)
-            else:
-                collection = self.chroma_client.get_or_create_collection(name=collection_name)
+            collection = self.get_collection()
+            for node in nodes:
+                # tenancy filter, kept out of the embedded and LLM text
+                node.metadata["user_id"] = user_id
+                if "user_id" not in node.excluded_embed_metadata_keys:
+                    node.excluded_embed_metadata_keys.append("user_id")
+                if "user_id" not in node.excluded_llm_metadata_keys:
+                    node.excluded_llm_metadata_keys.append("user_id")
             
-            print(f"Collection created: {collection}")
             # print(f"Number of nodes to store: {len(nodes)}")
-            # Set up vector store
-            vector_store = ChromaVectorStore(chroma_collection=collection)
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
-            
-            index = VectorStoreIndex(
-                nodes=nodes,
-                storage_context=storage_context,
-                embed_model=self.embed_model
-            )
-
-            index.storage_context.persist(persist_dir=self.chroma_persist_dir)
+            embed_progress = None
+            if progress_callback is not None:
+                embed_progress = lambda count: progress_callback("nodes_embedded", count)
+            await self.embedder.embed_nodes(nodes, progress_callback=embed_progress)
+            # chroma's client is synchronous, keep the event loop free while it writes
+            await asyncio.to_thread(self.replace_nodes, collection, user_id, nodes, overwrite, progress_callback)
+            await asyncio.to_thread(self.sparse_index.upsert_nodes, collection_name, nodes, overwrite)
+
+            self.bump_index_version(collection_name)
             logger.info(f"Documents stored successfully in collection: {collection_name}")
             print(f"index persisted sucessfully...")
             return True
@@ -160,13 +355,81 @@ class DataIngestionPipeline:
             logger.error(f"Error storing documents: {e}")
             return False
 
+    def replace_nodes(
+        self,
+        collection,
+        user_id: str,
+        nodes: List[Document],
+        overwrite: bool = False,
+        progress_callback: Optional[Callable[[str, int], None]] = None
+    ) -> None:
+        """
+        Delete the earlier nodes of the documents being stored (all of the user's with `overwrite`)
+        and upsert the new ones, under the write lock.
+
+        A changed file may now yield fewer parts, so every node of an earlier version of a
+        file being stored goes too, not only those of the doc ids that came back.
+        """
+        with self.chroma_write_lock():
+            if overwrite:
+                collection.delete(where={"user_id": user_id})
+            else:
+                ref_doc_ids = sorted({node.ref_doc_id for node in nodes if node.ref_doc_id})
+                if ref_doc_ids:
+                    collection.delete(where={"document_id": {"$in": ref_doc_ids}})
+                file_hashes = {
+                    (node.metadata["project_id"], node.metadata["file_path"]): node.metadata.get("file_hash", "")
+                    for node in nodes
+                    if node.metadata.get("project_id") and node.metadata.get("file_path")
+                }
+                for (project_id, file_path), file_hash in file_hashes.items():
+                    collection.delete(where={"$and": [
+                        {"user_id": user_id},
+                        {"project_id": project_id},
+                        {"file_path": file_path},
+                        {"file_hash": {"$ne": file_hash}},
+                    ]})
+            self.upsert_nodes(collection, nodes, progress_callback)
+
+    def upsert_nodes(
+        self,
+        collection,
+        nodes: List[Document],
+        progress_callback: Optional[Callable[[str, int], None]] = None
+    ) -> None:
+        """Bulk upsert embedded nodes into a Chroma collection, in the layout ChromaVectorStore reads."""
+        max_batch_size = self.chroma_client.get_max_batch_size()
+        for start in range(0, len(nodes), max_batch_size):
+            batch = nodes[start:start + max_batch_size]
+            metadatas = []
+            for node in batch:
+                metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+                metadatas.append({key: "" if value is None else value for key, value in metadata.items()})
+            collection.upsert(
+                ids=[node.node_id for node in batch],
+                embeddings=[node.get_embedding() for node in batch],
+                metadatas=metadatas,
+                documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in batch],
+            )
+            if progress_callback is not None:
+                progress_callback("nodes_stored", len(batch))
+
+    def bump_index_version(self, collection_name: str) -> str:
+        """Write a new version stamp for the collection so agent-side index caches reload it."""
+        version_dir = os.path.join(self.chroma_persist_dir, INDEX_VERSION_DIR)
+        os.makedirs(version_dir, exist_ok=True)
+        version = uuid.uuid4().hex
+        version_path = os.path.join(version_dir, f"{collection_name}.version")
+        tmp_path = f"{version_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, version_path)
+        return version
+
     async def get_query_engine(self, user_id: str, project_id: str, project_name: str,similarity_top_k: int = 3):
         """Get query engine for stored documents."""
         try:
-            collection_name = "embedding_store"
-            collection_name = f"{collection_name}_{user_id}"
-
-            collection = self.chroma_client.get_collection(collection_name)
+            collection = self.chroma_client.get_collection(settings.CHROMA_COLLECTION)
 
             # result = collection.query(
             #     query_texts=["list the name of board of directors"],
@@ -190,6 +453,7 @@ class DataIngestionPipeline:
             # Example: Filter for documents where author is "Alice" and category is "Tech"
             filters = MetadataFilters(
                 filters=[
+                    MetadataFilter(key="user_id", value=user_id),
                     MetadataFilter(key="project_id", value=project_id),
                     MetadataFilter(key="project_name", value=project_name),
                 ]
@@ -248,50 +512,3 @@ class DataIngestionPipeline:
         except Exception as e:
             logger.error(f"Error creating query engine: {e}")
             raise
-
-
-# def identify_document_type(file_path):
-#     ext = os.path.splitext(file_path)[1].lower()
-#     if ext == '.pdf':
-#         return 'pdf'
-#     elif ext == '.docx':
-#         return 'docx'
-#     elif ext in ['.xlsx', '.xls']:
-#         return 'excel'
-#     else:
-#         return 'unknown'
-
-
-# def chunk_document(file_path):
-#     doc_type = identify_document_type(file_path)
-#     if doc_type == 'pdf':
-#         return chunk_pdf(file_path)
-#     elif doc_type == 'docx':
-#         return chunk_docx(file_path)
-#     elif doc_type == 'excel':
-#         return chunk_excel(file_path)
-#     else:
-#         raise ValueError(f"Unsupported file type: {file_path}")
-    
-# def chunk_pdf(file_path):
-#     return partition_pdf(
-#         filename=file_path,
-#         infer_table_structure=True,
-#         strategy="hi_res",
-#         chunking_strategy="by_title",  # or "basic"
-#         size={"longest_edge": 10000}
-#     )
-
-# def chunk_docx(file_path):
-#     return partition_docx(
-#         filename=file_path,
-#         chunking_strategy="by_title",  # or "basic"
-#         max_characters=10000
-#     )
-
-# def chunk_excel(file_path):
-#     return partition_xlsx(
-#         filename=file_path,
-#         chunking_strategy="basic",     # "by_title" is rarely meaningful for Excel
-#         max_characters=10000
-#     )    
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Move existing data into the shared collection layout.
+
+    python -m genai.migrate_collections [--delete]
+
+Per-user `embedding_store_<user_id>` collections are copied into the shared
+collection with the user_id metadata it is filtered by. Embeddings are copied as
+stored, nothing is re-embedded. With --delete the per-user collections are
+dropped once copied.
+
+Every user's doc ids are then scoped to the user (`<user_id>/<project_id>/...`),
+in the shared collection and in the user's ingestion docstore, so re-ingesting a
+document only ever replaces that user's nodes. Finally the user's sparse index is
+rebuilt and the version stamp bumped so agents reload. Run it while no ingestion
+jobs are running; writes still take the workers' write lock. Safe to re-run.
+"""
+import os
+import sys
+import json
+import logging
+
+from llama_index.core.schema import NodeRelationship
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from config import settings
+from .ingestion_pipeline_async import DataIngestionPipeline, PIPELINE_STORAGE_DIR, tenant_key
+from .sparse_index import sparse_entry
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "embedding_store_"
+_PAGE_SIZE = 1000
+# IngestionPipeline.persist's default docstore file name
+_DOCSTORE_FNAME = "docstore.json"
+# doc id fields node_to_metadata_dict writes next to the node
+_DOC_ID_KEYS = ("document_id", "doc_id", "ref_doc_id")
+
+
+def user_scoped_id(user_id: str, doc_id: str) -> str:
+    # ids were `<project_id>/<file>` before they were scoped to the user
+    prefix = f"{user_id}/"
+    return doc_id if doc_id.startswith(prefix) else f"{prefix}{doc_id}"
+
+
+def migrate_collection(pipeline: DataIngestionPipeline, name: str, shared_collection) -> int:
+    user_id = name[len(_PREFIX):]
+    source = pipeline.chroma_client.get_collection(name)
+    copied = 0
+    while True:
+        page = source.get(
+            include=["embeddings", "metadatas", "documents"],
+            limit=_PAGE_SIZE,
+            offset=copied,
+        )
+        if not page["ids"]:
+            break
+        with pipeline.chroma_write_lock():
+            shared_collection.upsert(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                metadatas=[dict(metadata or {}, user_id=user_id) for metadata in page["metadatas"]],
+                documents=page["documents"],
+            )
+        copied += len(page["ids"])
+    return copied
+
+
+def scope_node_doc_ids(user_id: str, metadata: dict) -> dict:
+    metadata = dict(metadata)
+    for key in _DOC_ID_KEYS:
+        if metadata.get(key) and metadata[key] != "None":
+            metadata[key] = user_scoped_id(user_id, metadata[key])
+    # the node's SOURCE relationship is what ChromaVectorStore reads ref_doc_id from
+    if "_node_content" in metadata:
+        content = json.loads(metadata["_node_content"])
+        source = content.get("relationships", {}).get(NodeRelationship.SOURCE.value)
+        if source and source.get("node_id"):
+            source["node_id"] = user_scoped_id(user_id, source["node_id"])
+        metadata["_node_content"] = json.dumps(content)
+    return metadata
+
+
+def migrate_tenant(pipeline: DataIngestionPipeline, user_id: str, shared_collection) -> int:
+    """Scope the user's doc ids and rebuild the sparse index. Returns the user's node count."""
+    sparse_entries = {}
+    offset = 0
+    while True:
+        page = shared_collection.get(
+            where={"user_id": user_id},
+            include=["metadatas", "documents"],
+            limit=_PAGE_SIZE,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        metadatas = [scope_node_doc_ids(user_id, metadata or {}) for metadata in page["metadatas"]]
+        with pipeline.chroma_write_lock():
+            shared_collection.update(ids=page["ids"], metadatas=metadatas)
+        for node_id, metadata, text in zip(page["ids"], metadatas, page["documents"]):
+            sparse_entries[node_id] = sparse_entry(metadata_dict_to_node(metadata, text=text))
+        offset += len(page["ids"])
+
+    docstore_path = os.path.join(pipeline.pipeline_persist_dir(user_id), _DOCSTORE_FNAME)
+    with pipeline.chroma_write_lock():
+        migrate_docstore(user_id, docstore_path)
+
+    pipeline.sparse_index.upsert(tenant_key(user_id), sparse_entries, replace=True)
+    pipeline.bump_index_version(tenant_key(user_id))
+    return offset
+
+
+def migrate_docstore(user_id: str, docstore_path: str) -> None:
+    if os.path.exists(docstore_path):
+        docstore = SimpleDocumentStore.from_persist_path(docstore_path)
+        for doc_hash, doc_id in list(docstore.get_all_document_hashes().items()):
+            new_id = user_scoped_id(user_id, doc_id)
+            if new_id == doc_id:
+                continue
+            document = docstore.get_document(doc_id, raise_error=False)
+            if document is not None:
+                document.id_ = new_id
+                docstore.add_documents([document])
+            docstore.delete_document(doc_id, raise_error=False)
+            docstore.set_document_hash(new_id, doc_hash)
+        docstore.persist(docstore_path)
+
+
+def ingested_users(pipeline: DataIngestionPipeline) -> set:
+    """Users with an ingestion docstore, i.e. everyone who ingested since it was introduced."""
+    storage_dir = os.path.join(pipeline.chroma_persist_dir, PIPELINE_STORAGE_DIR)
+    if not os.path.isdir(storage_dir):
+        return set()
+    return {name[len(_PREFIX):] for name in os.listdir(storage_dir) if name.startswith(_PREFIX)}
+
+
+def migrate_all(delete: bool = False) -> None:
+    pipeline = DataIngestionPipeline()
+    shared_collection = pipeline.get_collection()
+    users = ingested_users(pipeline)
+    for collection in pipeline.chroma_client.list_collections():
+        # list_collections returns names on chroma >= 0.6 and Collection objects before
+        name = collection if isinstance(collection, str) else collection.name
+        if not name.startswith(_PREFIX) or name == settings.CHROMA_COLLECTION:
+            continue
+        copied = migrate_collection(pipeline, name, shared_collection)
+        users.add(name[len(_PREFIX):])
+        logger.info(f"Copied {copied} nodes from {name} into {settings.CHROMA_COLLECTION}")
+        if delete:
+            with pipeline.chroma_write_lock():
+                pipeline.chroma_client.delete_collection(name)
+            logger.info(f"Deleted {name}")
+
+    for user_id in sorted(users):
+        nodes = migrate_tenant(pipeline, user_id, shared_collection)
+        logger.info(f"Scoped doc ids and rebuilt the sparse index of {nodes} nodes for {tenant_key(user_id)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_all(delete="--delete" in sys.argv[1:])
@@ -0,0 +1,119 @@
+import os
+import re
+import json
+import fcntl
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from llama_index.core.schema import BaseNode, MetadataMode
+
+logger = logging.getLogger(__name__)
+
+# Read by the voice agents next to the Chroma data, one file per tenant.
+SPARSE_INDEX_DIR = "sparse_index"
+# Bumped when tokenization changes, the agents ignore files of another format.
+SPARSE_INDEX_FORMAT = 1
+
+# Words, and figures with their decimal points and thousands separators ("1,234.5", "2023").
+# The agents tokenize queries with the same rules (agents/utils/sparse_index.py).
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:,\d{3}(?!\d)|\.\d+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or s t that the this to was "
+    "were what when where which who will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token.replace(",", "")
+        for token in _TOKEN_RE.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def tokenizer_fingerprint() -> str:
+    """Identifies the tokenization rules; stored with the index so the two copies can't drift apart silently."""
+    rules = _TOKEN_RE.pattern + "\n" + " ".join(sorted(STOPWORDS))
+    return hashlib.sha256(rules.encode("utf-8")).hexdigest()[:16]
+
+
+TOKENIZER_FINGERPRINT = tokenizer_fingerprint()
+
+
+def sparse_entry(node: BaseNode) -> Dict:
+    """Term counts of the text the node was embedded from, plus what the agents filter on."""
+    return {
+        "ref_doc_id": node.ref_doc_id,
+        "project_id": node.metadata.get("project_id"),
+        # a changed file's nodes are all dropped, also parts the new version no longer has
+        "file_path": node.metadata.get("file_path"),
+        "file_hash": node.metadata.get("file_hash"),
+        "terms": dict(Counter(tokenize(node.get_content(metadata_mode=MetadataMode.EMBED)))),
+    }
+
+
+class SparseIndexWriter:
+    """
+    Per-tenant term statistics for BM25, written beside the Chroma data so the voice
+    agents can score exact tokens (names, fiscal years, figures) locally and fuse
+    them with vector results. Only term counts are stored; node text stays in Chroma.
+    """
+
+    def __init__(self, persist_dir: str):
+        self.index_dir = os.path.join(persist_dir, SPARSE_INDEX_DIR)
+
+    def path(self, tenant_key: str) -> str:
+        return os.path.join(self.index_dir, f"{tenant_key}.json")
+
+    def upsert(self, tenant_key: str, entries: Dict[str, Dict], replace: bool = False) -> None:
+        """
+        Add entries keyed by node id. As in the Chroma collection, a document's earlier
+        nodes are dropped when new nodes of it arrive, and so are the nodes of an earlier
+        version of a file the entries come from. `replace` drops everything else.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = self.path(tenant_key)
+        # ingestion workers may store for the same tenant at once
+        with open(f"{path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            docs = {} if replace else self._read(path)
+            replaced = {entry["ref_doc_id"] for entry in entries.values() if entry["ref_doc_id"]}
+            file_hashes = {
+                (entry["project_id"], entry["file_path"]): entry["file_hash"]
+                for entry in entries.values()
+                if entry.get("file_path")
+            }
+            docs = {
+                node_id: doc for node_id, doc in docs.items()
+                if doc["ref_doc_id"] not in replaced
+                and file_hashes.get((doc.get("project_id"), doc.get("file_path")), doc.get("file_hash"))
+                == doc.get("file_hash")
+            }
+            docs.update(entries)
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"format": SPARSE_INDEX_FORMAT, "tokenizer": TOKENIZER_FINGERPRINT, "docs": docs}, f)
+            os.replace(tmp_path, path)
+        logger.info(f"Sparse index for {tenant_key} holds {len(docs)} nodes")
+
+    def upsert_nodes(self, tenant_key: str, nodes: Iterable[BaseNode], replace: bool = False) -> None:
+        self.upsert(tenant_key, {node.node_id: sparse_entry(node) for node in nodes}, replace=replace)
+
+    @staticmethod
+    def _read(path: str) -> Dict[str, Dict]:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if data.get("format") != SPARSE_INDEX_FORMAT:
+            # counted with other tokenization rules, rebuilt from the nodes stored from now on
+            logger.warning(f"Discarding sparse index {path} of format {data.get('format')}")
+            return {}
+        if data.get("tokenizer", TOKENIZER_FINGERPRINT) != TOKENIZER_FINGERPRINT:
+            logger.warning(f"Discarding sparse index {path} counted with other tokenization rules")
+            return {}
+        return data["docs"]
@@ -1,18 +1,40 @@
 from fastapi import APIRouter, HTTPException
-from models.data_ingestion import DataIngestionRequest, DataIngestionResponse 
-from services.data_ingestion import DataIngestionService
+from fastapi.responses import StreamingResponse
+from models.data_ingestion import DataIngestionRequest, DataIngestionResponse, IngestionStatusResponse
+from services.data_ingestion import IngestionStatus
+from services.ingestion_queue import IngestionJobQueue, IngestionWorkerPool
+from services.ingestion_status import IngestionStatusStore, TERMINAL_STATUSES
+from config import settings
+from typing import Optional
 import logging
-import uuid
 import asyncio
-from enum import Enum
-from typing import Dict
+import time
+import uuid
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-data_ingestion_service = DataIngestionService()
 
-# In-memory status tracking (use Redis/DB in production)
-ingestion_statuses: Dict[str, str] = {}
+# seconds between status store reads while a client waits for a change
+STATUS_POLL_INTERVAL = 0.5
+
+# jobs survive API restarts and are processed outside the API process
+ingestion_status_store = IngestionStatusStore(
+    settings.INGESTION_QUEUE_PATH,
+    ttl_seconds=settings.INGESTION_STATUS_TTL_SECONDS,
+)
+ingestion_queue = IngestionJobQueue(
+    settings.INGESTION_QUEUE_PATH,
+    lease_seconds=settings.INGESTION_LEASE_SECONDS,
+    max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    backoff_seconds=settings.INGESTION_RETRY_BACKOFF_SECONDS,
+    status_store=ingestion_status_store,
+)
+ingestion_worker_pool = IngestionWorkerPool(
+    ingestion_queue,
+    ingestion_status_store,
+    num_workers=settings.INGESTION_WORKERS,
+    poll_interval=settings.INGESTION_POLL_INTERVAL_SECONDS,
+)
 
 @router.post("/data-ingest", response_model=DataIngestionResponse)
 async def ingest_document(req: DataIngestionRequest) -> DataIngestionResponse:
@@ -22,19 +44,21 @@ async def ingest_document(req: DataIngestionRequest) -> DataIngestionResponse:
         submission_id = str(uuid.uuid4())
         
         print(f"Received data ingestion request: {req}")
-        # Start background task for processing
-        asyncio.create_task(
-            data_ingestion_service.process_data_and_ingest(
-                user_id=req.user_id,
-                project_id=req.project_id,
-                project_name=req.project_name,
-                doc_loc=req.doc_location,
-                docs=req.docs,
-                submission_id=submission_id
-            )
+        # the status row must exist before a worker can pick the job up
+        ingestion_status_store.create(submission_id)
+        ingestion_queue.enqueue(
+            job_id=submission_id,
+            user_id=req.user_id,
+            payload={
+                "user_id": req.user_id,
+                "project_id": req.project_id,
+                "project_name": req.project_name,
+                "doc_loc": req.doc_location,
+                "docs": req.docs,
+            },
         )
         return DataIngestionResponse(
-            message="Documet ingestion started in background.",
+            message="Documet ingestion queued.",
             submission_id=submission_id
         )
 
@@ -44,7 +68,59 @@ async def ingest_document(req: DataIngestionRequest) -> DataIngestionResponse:
             detail=f"Failed to start ingestion for documents: {str(e)}"
         )
 
-@router.get("/status/{submission_id}")
-async def get_status(submission_id: str):
-    status = data_ingestion_service.get_ingestion_status(submission_id)
-    return {"status": status}
\ No newline at end of file
+async def _read_status(submission_id: str) -> IngestionStatusResponse:
+    status = await asyncio.to_thread(ingestion_status_store.get, submission_id)
+    if status is None:
+        return IngestionStatusResponse(
+            submission_id=submission_id,
+            status=IngestionStatus.FAILED,
+            message="Unknown or expired submission."
+        )
+    return IngestionStatusResponse(**status)
+
+def _is_final(status: IngestionStatusResponse) -> bool:
+    return status.updated_at is None or status.status in TERMINAL_STATUSES
+
+@router.get("/status/{submission_id}", response_model=IngestionStatusResponse)
+async def get_status(submission_id: str) -> IngestionStatusResponse:
+    return await _read_status(submission_id)
+
+@router.get("/status/{submission_id}/wait", response_model=IngestionStatusResponse)
+async def wait_for_status(
+    submission_id: str,
+    since: Optional[float] = None,
+    timeout: float = settings.INGESTION_STATUS_MAX_WAIT_SECONDS
+) -> IngestionStatusResponse:
+    """Long-poll: return once the status changes after `since` (its last seen `updated_at`) or on timeout."""
+    deadline = time.monotonic() + min(timeout, settings.INGESTION_STATUS_MAX_WAIT_SECONDS)
+    status = await _read_status(submission_id)
+    while not _is_final(status) and (since is None or status.updated_at <= since) and time.monotonic() < deadline:
+        await asyncio.sleep(STATUS_POLL_INTERVAL)
+        status = await _read_status(submission_id)
+    return status
+
+@router.get("/status/{submission_id}/events")
+async def stream_status(submission_id: str) -> StreamingResponse:
+    """Server-sent events: one event per status or progress change, closed once the submission finishes."""
+    async def events():
+        last_update = None
+        while True:
+            status = await _read_status(submission_id)
+            if status.updated_at != last_update or _is_final(status):
+                last_update = status.updated_at
+                yield f"data: {status.model_dump_json()}\n\n"
+            if _is_final(status):
+                return
+            await asyncio.sleep(STATUS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@router.post("/cancel/{submission_id}")
+async def cancel_ingestion(submission_id: str):
+    if ingestion_queue.get(submission_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown submission {submission_id}")
+    cancelled = ingestion_queue.cancel(submission_id)
+    if cancelled and ingestion_queue.get(submission_id)["status"] == IngestionStatus.CANCELLED:
+        # never started, a running job is marked cancelled by its worker
+        ingestion_status_store.set_status(submission_id, IngestionStatus.CANCELLED, "Cancelled by request.")
+    return {"cancelled": cancelled}
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException
-from models.livekit import CreateRoomRequest, RoomResponse , RoomStatusResponse
+from fastapi import APIRouter, HTTPException, Request
+from livekit import api
+from models.livekit import CreateRoomRequest, RoomResponse , RoomStatusResponse, BatchCreateRoomRequest, BatchRoomResponse
 from services.livekit import LiveKitService
+from config import settings
+import asyncio
+import logging
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 livekit_service = LiveKitService()
+webhook_receiver = api.WebhookReceiver(api.TokenVerifier(settings.LIVEKIT_API_KEY, settings.LIVEKIT_API_SECRET))
+
+# webhook events that change what /check reports for a room
+ROOM_STATE_EVENTS = {"room_started", "room_finished", "participant_joined", "participant_left"}
 
 @router.post("/create-room", response_model=RoomResponse)
 async def create_room_and_dispatch_agent(req: CreateRoomRequest) -> RoomResponse:
 
+    if req.precreate_room and not await livekit_service.ensure_room(req.room_name, req.agent_name, req.user_id):
+        raise HTTPException(status_code=500, detail="Failed to create room")
+
     # Dispatch agent
     dispatch_success,token = await livekit_service.create_token_with_agent_dispatch(req.room_name, req.agent_name, req.user_id)
     if not dispatch_success:
@@ -20,6 +32,40 @@ async def create_room_and_dispatch_agent(req: CreateRoomRequest) -> RoomResponse
         agent_dispatched=dispatch_success
     )
 
+@router.post("/create-rooms", response_model=BatchRoomResponse)
+async def create_rooms_and_dispatch_agents(req: BatchCreateRoomRequest) -> BatchRoomResponse:
+    """
+    Issue tokens for many (room, user, agent) tuples in one call, e.g. when onboarding a class
+    or a call-center shift. Rooms to pre-create are created once each, concurrently.
+    """
+    if len(req.rooms) > settings.TOKEN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {settings.TOKEN_BATCH_MAX_SIZE} rooms per request")
+
+    precreate = {}
+    for room in req.rooms:
+        if room.precreate_room:
+            precreate.setdefault(room.room_name, room)
+    created = await asyncio.gather(*(
+        livekit_service.ensure_room(room.room_name, room.agent_name, room.user_id)
+        for room in precreate.values()
+    ))
+    failed = [name for name, ok in zip(precreate, created) if not ok]
+    if failed:
+        raise HTTPException(status_code=500, detail=f"Failed to create rooms: {', '.join(failed)}")
+
+    responses = []
+    for room in req.rooms:
+        dispatch_success,token = await livekit_service.create_token_with_agent_dispatch(room.room_name, room.agent_name, room.user_id)
+        if not dispatch_success:
+            raise HTTPException(status_code=500, detail=f"Failed to dispatch agent for room {room.room_name}")
+        responses.append(RoomResponse(
+            room=room.room_name,
+            user_token=token,
+            agent_name=room.agent_name,
+            agent_dispatched=dispatch_success
+        ))
+    return BatchRoomResponse(rooms=responses)
+
 @router.get("/check/{room_name}", response_model=RoomStatusResponse)
 async def check_room_and_agent_status(room_name: str) -> RoomStatusResponse:
     """
@@ -34,4 +80,21 @@ async def check_room_and_agent_status(room_name: str) -> RoomStatusResponse:
             participants=participants
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to check room and agent status: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to check room and agent status: {str(e)}")
+
+@router.post("/webhook")
+async def receive_livekit_webhook(request: Request):
+    """
+    LiveKit webhook target, optional: point the server's webhook config here so room
+    changes invalidate the /check cache immediately instead of after its TTL.
+    """
+    body = await request.body()
+    try:
+        event = webhook_receiver.receive(body.decode("utf-8"), request.headers.get("Authorization", ""))
+    except Exception as e:
+        logger.warning(f"Rejected LiveKit webhook: {e}")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    if event.event in ROOM_STATE_EVENTS and event.room.name:
+        livekit_service.invalidate_room(event.room.name)
+    return {"received": True}
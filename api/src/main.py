@@ -1,11 +1,21 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from handler.livekit import router as room_router
-from handler.data_ingestion import router as data_ingestion_router
+from handler.livekit import router as room_router, livekit_service
+from handler.data_ingestion import router as data_ingestion_router, ingestion_worker_pool
 
-app = FastAPI(title="Voice Agent")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await livekit_service.start()
+    ingestion_worker_pool.start()
+    yield
+    ingestion_worker_pool.stop()
+    await livekit_service.aclose()
+
+app = FastAPI(title="Voice Agent", lifespan=lifespan)
 app.include_router(room_router, prefix="/api/v1/rooms")
 app.include_router(data_ingestion_router, prefix="/api/v1/pipeline")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000,log_level="debug")
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000,log_level="debug")
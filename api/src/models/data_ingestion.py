@@ -1,5 +1,5 @@
 from pydantic import BaseModel,Field
-from typing import List
+from typing import Dict, List, Optional
 
 class DataIngestionRequest(BaseModel):
     user_id: str
@@ -12,5 +12,10 @@ class DataIngestionResponse(BaseModel):
     message: str
     submission_id: str
 
-    
-    
\ No newline at end of file
+class IngestionStatusResponse(BaseModel):
+    submission_id: str
+    status: str
+    message: Optional[str] = None
+    # documents_loaded, nodes_chunked, nodes_extracted, nodes_embedded, nodes_stored
+    progress: Dict[str, int] = Field(default_factory=dict)
+    updated_at: Optional[float] = None
@@ -5,6 +5,8 @@ class CreateRoomRequest(BaseModel):
     room_name: str
     user_id: str
     agent_name: str
+    # create the room and dispatch the agent through the server API before returning
+    precreate_room: bool = False
 
 class RoomResponse(BaseModel):
     room: str
@@ -12,6 +14,12 @@ class RoomResponse(BaseModel):
     agent_name: str
     agent_dispatched: bool
 
+class BatchCreateRoomRequest(BaseModel):
+    rooms: List[CreateRoomRequest]
+
+class BatchRoomResponse(BaseModel):
+    rooms: List[RoomResponse]
+
 class RoomStatusResponse(BaseModel):
     room_name: str
     room_exists: bool
@@ -1,10 +1,9 @@
 import os
+import asyncio
 import logging
-from unstructured.partition.pdf import partition_pdf
-from unstructured.partition.docx import partition_docx
-from unstructured.partition.xlsx import partition_xlsx
-from genai.ingestion_pipeline_async import DataIngestionPipeline
-from typing import Dict, Tuple
+from genai.ingestion_pipeline_async import DataIngestionPipeline, InvalidIngestionInput
+from config import settings
+from typing import Tuple
 from enum import Enum
 
 logger = logging.getLogger(__name__)
@@ -14,14 +13,16 @@ class IngestionStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 class DataIngestionService:
 
-    def __init__(self):
+    def __init__(self, status_store):
         # self.embed_model = getAzureLLMIndexEmbeddingModel()
         # self.llm_model = getAzureLLMIndexModel()
         self.ingestion_pipeline = DataIngestionPipeline()
-        self.ingestion_statuses: Dict[str, str] = {}  # Move status tracking to service
+        # IngestionStatusStore shared with the API, which reads status and progress from it
+        self.status_store = status_store
         
     async def process_data_and_ingest(
             self, 
@@ -32,47 +33,82 @@ class DataIngestionService:
             docs: list[str],
             submission_id: str
         ) -> Tuple[bool, str]:
+        """
+        Ingest one submission. Failures are returned as (False, message) and left to the
+        worker, which decides between a retry and FAILED; InvalidIngestionInput is raised
+        for requests that can never succeed.
+        """
+        def report_progress(stage: str, count: int) -> None:
+            self.status_store.add_progress(submission_id, stage, count)
+
         try:
             logger.info(f"Processing documents for user {user_id} at location {doc_loc}")
-            self.ingestion_statuses[submission_id] = IngestionStatus.PROCESSING
+            self.status_store.reset_progress(submission_id)
+            self.status_store.set_status(submission_id, IngestionStatus.PROCESSING)
             docs = [doc.strip() for doc in docs if doc.strip()]
             if not docs:
-                self.ingestion_statuses[submission_id] = IngestionStatus.FAILED
-                return False, "No valid documents provided for ingestion."
+                raise InvalidIngestionInput("No valid documents provided for ingestion.")
             # Your processing logic here
-            llamaindex_ingestion_pipeline = await self.ingestion_pipeline.create_pipeline_with_llamindex(add_processes=True)
-            documents = await self.ingestion_pipeline.load_documents_with_llamaindex(input_dir=doc_loc, input_files=docs)
+            llamaindex_ingestion_pipeline = await self.ingestion_pipeline.create_pipeline_with_llamindex(add_processes=True, user_id=user_id)
 
-            # TODO -- remove this comment - For testing purposes, I am just using 3 documents
-            success,nodes = await self.ingestion_pipeline.process_documents(project_id=project_id,
-                                                                            project_name=project_name,documents=documents, pipeline=llamaindex_ingestion_pipeline)
-            
-            if not success:
-                self.ingestion_statuses[submission_id] = IngestionStatus.FAILED
-                return False, "Failed to process documents."
-            
-            if not nodes:
-                self.ingestion_statuses[submission_id] = IngestionStatus.FAILED
-                return False, "No nodes generated from the documents."          
-            
-            store_success = await self.ingestion_pipeline.store_documents(user_id=user_id,nodes=nodes) 
-            # , overwrite=False)
-            print(f"store_success: {store_success}")
+            # documents are loaded a file at a time while earlier batches are extracted, embedded
+            # and stored; the bounded queue stops the loader from running ahead of the pipeline
+            batches: asyncio.Queue = asyncio.Queue(maxsize=settings.INGESTION_PREFETCH_BATCHES)
+
+            async def load_batches() -> None:
+                try:
+                    async for batch in self.ingestion_pipeline.iter_document_batches(
+                        input_dir=doc_loc,
+                        input_files=docs,
+                        batch_size=settings.INGESTION_DOCUMENT_BATCH_SIZE
+                    ):
+                        report_progress("documents_loaded", len(batch))
+                        await batches.put(batch)
+                except Exception:
+                    # wake the consumer, awaiting the loader re-raises the error
+                    await batches.put(None)
+                    raise
+                await batches.put(None)
 
-            if not store_success:
-                self.ingestion_statuses[submission_id] = IngestionStatus.FAILED
-                return False, "Failed to store processed documents."  
+            loader = asyncio.create_task(load_batches())
+            nodes_stored = 0
+            try:
+                while (documents := await batches.get()) is not None:
+                    success,nodes = await self.ingestion_pipeline.process_documents(user_id=user_id,project_id=project_id,
+                                                                                    project_name=project_name,documents=documents, pipeline=llamaindex_ingestion_pipeline,
+                                                                                    progress_callback=report_progress)
+                    if not success:
+                        return False, "Failed to process documents."
+                    if not nodes:
+                        # every document in the batch was already ingested with the same content
+                        continue
 
-            self.ingestion_statuses[submission_id] = IngestionStatus.COMPLETED
+                    store_success = await self.ingestion_pipeline.store_documents(user_id=user_id,nodes=nodes,progress_callback=report_progress) 
+                    # , overwrite=False)
+                    print(f"store_success: {store_success}")
+
+                    if not store_success:
+                        return False, "Failed to store processed documents."  
+                    nodes_stored += len(nodes)
+                    # record the batch's document hashes now, a retry after a later batch fails
+                    # then skips what is already stored instead of storing it again
+                    await self.ingestion_pipeline.persist_pipeline(user_id, llamaindex_ingestion_pipeline)
+                await loader
+            finally:
+                loader.cancel()
+
+            if not nodes_stored:
+                self.status_store.set_status(submission_id, IngestionStatus.COMPLETED, "Documents are already up to date.")
+                return True, "Documents are already up to date."
+
+            self.status_store.set_status(submission_id, IngestionStatus.COMPLETED, "Documents processed and ingested successfully.")
             #TODO - remove after testing --- to test the fetch from the store
             # await self.ingestion_pipeline.get_query_engine(user_id,project_id=project_id,project_name=project_name) 
             
             logger.info(f"Documents processed and stored successfully for user {user_id}.")           
             return True, "Documents processed and ingested successfully."   
+        except InvalidIngestionInput:
+            raise
         except Exception as e:
             logger.error(f"Error processing documents: {e}")
-            self.ingestion_statuses[submission_id] = IngestionStatus.FAILED
             return False, str(e)
-        
-    def get_ingestion_status(self, submission_id: str) -> str:
-        return self.ingestion_statuses.get(submission_id, IngestionStatus.FAILED)
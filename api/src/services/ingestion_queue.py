@@ -0,0 +1,391 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+import sqlite3
+import multiprocessing
+from typing import List, Optional, Tuple
+
+from .data_ingestion import IngestionStatus
+from .ingestion_status import IngestionStatusStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_run_at REAL NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    leased_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status, next_run_at);
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_user ON ingestion_jobs (user_id, status);
+"""
+
+# One running job per user: a job loads the user's pipeline docstore when it starts and
+# persists it when it ends, so two at once would lose one's document hashes.
+# The user served least recently first, then the oldest job.
+_CLAIM_QUERY = """
+SELECT j.job_id FROM ingestion_jobs j
+WHERE j.status = ? AND j.next_run_at <= ?
+    AND NOT EXISTS (SELECT 1 FROM ingestion_jobs r WHERE r.user_id = j.user_id AND r.status = ?)
+ORDER BY
+    COALESCE((SELECT MAX(s.started_at) FROM ingestion_jobs s WHERE s.user_id = j.user_id), 0),
+    j.created_at
+LIMIT 1
+"""
+
+
+class IngestionJobQueue:
+    """
+    Durable ingestion job queue backed by SQLite, shared by the API and the worker processes.
+
+    A claimed job is leased to its worker for `lease_seconds`, and the worker renews the
+    lease while it runs the job. Only jobs whose lease expired, because their worker
+    died or stalled, are put back in the queue, so several API processes or replicas
+    can run worker pools on the same queue.
+
+    A failed or expired job is retried with exponential backoff until it has run
+    `max_attempts` times, then marked failed, also in `status_store` when given.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float,
+        max_attempts: int,
+        backoff_seconds: float,
+        status_store: Optional[IngestionStatusStore] = None,
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.status_store = status_store
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            if "leased_until" not in columns:
+                # queues created before jobs were leased
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN leased_until REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, job_id: str, user_id: str, payload: dict) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingestion_jobs (job_id, user_id, payload, status, next_run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, json.dumps(payload), IngestionStatus.PENDING, now, now, now),
+            )
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically take the next runnable job, or None if there is nothing to do."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = self._requeue_expired(conn, now)
+            row = conn.execute(
+                _CLAIM_QUERY, (IngestionStatus.PENDING, now, IngestionStatus.PROCESSING)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                self._report_expired(expired)
+                return None
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, attempts = attempts + 1, worker_id = ?, "
+                "leased_until = ?, started_at = ?, updated_at = ? WHERE job_id = ?",
+                (IngestionStatus.PROCESSING, worker_id, now + self.lease_seconds, now, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self._report_expired(expired)
+        return self.get(row["job_id"])
+
+    def renew_lease(self, job_id: str, worker_id: str) -> bool:
+        """Extend the worker's lease on a running job. False if the job is no longer the worker's."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET leased_until = ?, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, job_id, worker_id, IngestionStatus.PROCESSING),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str) -> None:
+        self._set_status(job_id, IngestionStatus.COMPLETED)
+
+    def fail(self, job_id: str, error: str, retryable: bool = True) -> bool:
+        """
+        Schedule a retry with exponential backoff, or mark the job failed once attempts run out
+        or if the error is not retryable. Returns True if the job will be retried.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return False
+        if not retryable or job["attempts"] >= self.max_attempts:
+            self._set_status(job_id, IngestionStatus.FAILED, error)
+            return False
+        next_run_at = self._retry_at(job["attempts"], time.time())
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, next_run_at = ?, error = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (IngestionStatus.PENDING, next_run_at, error, time.time(), job_id, IngestionStatus.PROCESSING),
+            )
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending job, or ask the worker running it to stop. False if already finished."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (IngestionStatus.CANCELLED, now, job_id, IngestionStatus.PENDING),
+            )
+            if cursor.rowcount:
+                return True
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND status = ?",
+                (now, job_id, IngestionStatus.PROCESSING),
+            )
+            return cursor.rowcount > 0
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT cancel_requested FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def mark_cancelled(self, job_id: str) -> None:
+        self._set_status(job_id, IngestionStatus.CANCELLED)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def requeue_expired(self) -> int:
+        """Retry jobs whose worker stopped renewing its lease, or fail them once attempts run out."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = self._requeue_expired(conn, time.time())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self._report_expired(expired)
+        return len(expired)
+
+    def _retry_at(self, attempts: int, now: float) -> float:
+        return now + self.backoff_seconds * 2 ** (attempts - 1)
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> List[Tuple[str, IngestionStatus, str]]:
+        # a NULL lease was taken before leases existed, its worker is long gone
+        rows = conn.execute(
+            "SELECT job_id, attempts FROM ingestion_jobs "
+            "WHERE status = ? AND (leased_until IS NULL OR leased_until < ?)",
+            (IngestionStatus.PROCESSING, now),
+        ).fetchall()
+        expired = []
+        for row in rows:
+            # a job that keeps killing its worker (out of memory on a huge file) must not retry forever
+            if row["attempts"] >= self.max_attempts:
+                status, next_run_at = IngestionStatus.FAILED, now
+                error = f"The ingestion worker stopped during each of {row['attempts']} attempts."
+            else:
+                status, next_run_at = IngestionStatus.PENDING, self._retry_at(row["attempts"], now)
+                error = "The ingestion worker stopped during the job."
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, next_run_at = ?, worker_id = NULL, leased_until = NULL, "
+                "error = ?, updated_at = ? WHERE job_id = ?",
+                (status, next_run_at, error, now, row["job_id"]),
+            )
+            expired.append((row["job_id"], status, error))
+        if expired:
+            logger.warning(f"{len(expired)} ingestion jobs lost their worker's lease")
+        return expired
+
+    def _report_expired(self, expired: List[Tuple[str, IngestionStatus, str]]) -> None:
+        # after the queue transaction commits, the status store writes to the same database
+        if self.status_store is None:
+            return
+        for job_id, status, error in expired:
+            message = error if status == IngestionStatus.FAILED else f"Retrying after error: {error}"
+            self.status_store.set_status(job_id, status, message)
+
+    def _set_status(self, job_id: str, status: IngestionStatus, error: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, error = COALESCE(?, error), updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+
+async def _worker_loop(
+    queue: IngestionJobQueue,
+    status_store: IngestionStatusStore,
+    worker_id: str,
+    stop_event,
+    poll_interval: float,
+) -> None:
+    # imported here so only worker processes load the parsing and model stack
+    from .data_ingestion import DataIngestionService
+    from genai.ingestion_pipeline_async import InvalidIngestionInput
+
+    service = DataIngestionService(status_store)
+    logger.info(f"Ingestion worker {worker_id} started")
+
+    while not stop_event.is_set():
+        job = await asyncio.to_thread(queue.claim, worker_id)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        job_id = job["job_id"]
+        logger.info(f"Worker {worker_id} running ingestion job {job_id} (attempt {job['attempts']})")
+        task = asyncio.create_task(
+            service.process_data_and_ingest(submission_id=job_id, **job["payload"])
+        )
+        cancelled = False
+        lease_lost = False
+        renewed_at = time.monotonic()
+        while not task.done():
+            await asyncio.wait({task}, timeout=poll_interval)
+            if task.done():
+                break
+            if await asyncio.to_thread(queue.is_cancel_requested, job_id):
+                task.cancel()
+                cancelled = True
+            elif time.monotonic() - renewed_at >= queue.lease_seconds / 3:
+                if not await asyncio.to_thread(queue.renew_lease, job_id, worker_id):
+                    task.cancel()
+                    lease_lost = True
+                renewed_at = time.monotonic()
+
+        if lease_lost:
+            # the job was requeued after this worker stalled past its lease, another worker owns it
+            logger.warning(f"Worker {worker_id} lost the lease on ingestion job {job_id}, abandoning it")
+            continue
+        if cancelled:
+            queue.mark_cancelled(job_id)
+            status_store.set_status(job_id, IngestionStatus.CANCELLED, "Cancelled by request.")
+            logger.info(f"Ingestion job {job_id} cancelled")
+            continue
+        retryable = True
+        try:
+            success, message = task.result()
+        except InvalidIngestionInput as e:
+            success, message, retryable = False, str(e), False
+        except Exception as e:
+            success, message = False, str(e)
+        if success:
+            queue.complete(job_id)
+            continue
+        logger.error(f"Ingestion job {job_id} failed: {message}")
+        # only written here, so status clients never see FAILED for a job that will be retried
+        if queue.fail(job_id, message, retryable=retryable):
+            status_store.set_status(job_id, IngestionStatus.PENDING, f"Retrying after error: {message}")
+        else:
+            status_store.set_status(job_id, IngestionStatus.FAILED, message)
+
+
+def run_ingestion_worker(
+    queue: IngestionJobQueue,
+    status_store: IngestionStatusStore,
+    worker_id: str,
+    stop_event,
+    poll_interval: float,
+) -> None:
+    """Entry point of an ingestion worker process."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker_loop(queue, status_store, worker_id, stop_event, poll_interval))
+
+
+class IngestionWorkerPool:
+    """
+    Pool of ingestion worker processes, so CPU-heavy parsing never runs in the API process.
+    """
+
+    def __init__(
+        self,
+        queue: IngestionJobQueue,
+        status_store: IngestionStatusStore,
+        num_workers: int,
+        poll_interval: float,
+    ):
+        self.queue = queue
+        self.status_store = status_store
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        # spawn, so workers don't inherit the API's event loop and sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes = []
+
+    def start(self) -> None:
+        self.queue.requeue_expired()
+        self._stop_event = self._context.Event()
+        # unique across API processes and hosts sharing the queue
+        pool_id = f"{socket.gethostname()}-{os.getpid()}"
+        for i in range(self.num_workers):
+            process = self._context.Process(
+                target=run_ingestion_worker,
+                args=(
+                    self.queue,
+                    self.status_store,
+                    f"ingestion-worker-{pool_id}-{i}",
+                    self._stop_event,
+                    self.poll_interval,
+                ),
+                name=f"ingestion-worker-{i}",
+                # not daemonic, workers start their own parsing process pool; stop() reaps them
+                daemon=False,
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {self.num_workers} ingestion workers")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                # the interrupted job is requeued once its lease expires
+                process.terminate()
+                process.join()
+        self._processes = []
+        self._stop_event = None
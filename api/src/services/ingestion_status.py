@@ -0,0 +1,111 @@
+import time
+import sqlite3
+import logging
+from typing import Optional
+
+from .data_ingestion import IngestionStatus
+
+logger = logging.getLogger(__name__)
+
+# Progress counters, in pipeline order.
+PROGRESS_STAGES = (
+    "documents_loaded",
+    "nodes_chunked",
+    "nodes_extracted",
+    "nodes_embedded",
+    "nodes_stored",
+)
+TERMINAL_STATUSES = (IngestionStatus.COMPLETED, IngestionStatus.FAILED, IngestionStatus.CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_status (
+    submission_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    message TEXT,
+    {stage_columns},
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingestion_status_updated ON ingestion_status (status, updated_at);
+""".format(stage_columns=",\n    ".join(f"{stage} INTEGER NOT NULL DEFAULT 0" for stage in PROGRESS_STAGES))
+
+
+class IngestionStatusStore:
+    """
+    Submission status and per-stage progress, persisted in SQLite so it survives
+    restarts and is shared by the API and the ingestion workers. Finished
+    submissions are evicted `ttl_seconds` after their last update.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, submission_id: str) -> None:
+        self.evict_expired()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ingestion_status (submission_id, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (submission_id, IngestionStatus.PENDING, now, now),
+            )
+
+    def set_status(self, submission_id: str, status: IngestionStatus, message: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_status SET status = ?, message = ?, updated_at = ? WHERE submission_id = ?",
+                (status, message, time.time(), submission_id),
+            )
+
+    def reset_progress(self, submission_id: str) -> None:
+        """Zero the counters before a (re)try, so progress never counts an attempt twice."""
+        assignments = ", ".join(f"{stage} = 0" for stage in PROGRESS_STAGES)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingestion_status SET {assignments}, updated_at = ? WHERE submission_id = ?",
+                (time.time(), submission_id),
+            )
+
+    def add_progress(self, submission_id: str, stage: str, count: int) -> None:
+        if stage not in PROGRESS_STAGES:
+            raise ValueError(f"Unknown ingestion stage: {stage}")
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingestion_status SET {stage} = {stage} + ?, updated_at = ? WHERE submission_id = ?",
+                (count, time.time(), submission_id),
+            )
+
+    def get(self, submission_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM ingestion_status WHERE submission_id = ?", (submission_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "submission_id": row["submission_id"],
+            "status": row["status"],
+            "message": row["message"],
+            "progress": {stage: row[stage] for stage in PROGRESS_STAGES},
+            "updated_at": row["updated_at"],
+        }
+
+    def evict_expired(self) -> int:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM ingestion_status WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, time.time() - self.ttl_seconds),
+            )
+        if cursor.rowcount:
+            logger.info(f"Evicted {cursor.rowcount} expired ingestion statuses")
+        return cursor.rowcount
@@ -1,48 +1,129 @@
+import time
+import asyncio
+import aiohttp
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
 from livekit import api,protocol
 from config import settings
-from livekit.rtc import Room
 import logging
 logger = logging.getLogger(__name__)
 
 class LiveKitService:
 
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lkapi: Optional[api.LiveKitAPI] = None
+        # room name -> (fetched at, (room_exists, participants))
+        self._room_cache: Dict[str, Tuple[float, Tuple[bool, List[str]]]] = {}
+        # room name -> the in-flight fetch shared by concurrent callers
+        self._room_fetches: Dict[str, asyncio.Future] = {}
+        # (identity, room, agent) -> (expires at, token)
+        self._token_cache: Dict[Tuple[str, str, str], Tuple[float, str]] = {}
+
+    async def start(self) -> None:
+        """Open the process-wide server API client, called from the FastAPI lifespan."""
+        if self._lkapi is not None:
+            return
+        # one keep-alive connection pool per process instead of a new HTTP session per request
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.LIVEKIT_API_MAX_CONNECTIONS,
+                keepalive_timeout=settings.LIVEKIT_API_KEEPALIVE_SECONDS,
+            ),
+            timeout=aiohttp.ClientTimeout(total=settings.LIVEKIT_API_TIMEOUT_SECONDS),
+        )
+        self._lkapi = api.LiveKitAPI(
+            settings.LIVEKIT_HOST,
+            settings.LIVEKIT_API_KEY,
+            settings.LIVEKIT_API_SECRET,
+            session=self._session
+        )
+
+    async def aclose(self) -> None:
+        if self._lkapi is not None:
+            await self._lkapi.aclose()
+            self._lkapi = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def lkapi(self) -> api.LiveKitAPI:
+        if self._lkapi is None:
+            raise RuntimeError("LiveKitService.start() must be called before using the server API.")
+        return self._lkapi
+
     async def check_room_participants(self, room_name: str) -> tuple[bool, list[str]]:
         """
         Check if room exists and agent is registered.
-        Returns: (room_exists: bool, agent_registered: bool)
-        """
-        try:
-            lkapi = api.LiveKitAPI(
-                settings.LIVEKIT_HOST,
-                settings.LIVEKIT_API_KEY,
-                settings.LIVEKIT_API_SECRET
-            )
+        Returns: (room_exists: bool, participants: list[str])
 
-            # Check if room exists
-            try:
-                room_exists = False
-                rooms_response = await lkapi.room.list_rooms(api.ListRoomsRequest(names=[room_name]))
-                print("room_name_list",rooms_response)
-                if rooms_response is None or not rooms_response.rooms:
-                    logger.info(f"Room '{room_name}' does not exist.")
-                else:
-                    room_exists = True
-            except Exception as e:
-                logger.error(f"Error checking room: {e}")
-
-            if room_exists:
-                participants_response = await lkapi.room.list_participants(api.ListParticipantsRequest(room=room_name))
-                participants_list = [p.identity for p in participants_response.participants]
-   
-            await lkapi.aclose()
-            return room_exists, participants_list
+        Results are cached for ROOM_STATE_CACHE_TTL_SECONDS and concurrent callers for
+        the same room share one server API fetch, so pollers don't multiply API load.
+        """
+        cached = self._room_cache.get(room_name)
+        if cached is not None and time.monotonic() - cached[0] < settings.ROOM_STATE_CACHE_TTL_SECONDS:
+            return cached[1]
 
+        fetch = self._room_fetches.get(room_name)
+        if fetch is None:
+            started_at = time.monotonic()
+            fetch = asyncio.ensure_future(self._fetch_room_participants(room_name))
+            self._room_fetches[room_name] = fetch
+            fetch.add_done_callback(lambda f: self._on_room_fetched(room_name, started_at, f))
+        try:
+            # shielded, a caller that disconnects must not cancel the fetch for the others
+            return await asyncio.shield(fetch)
         except Exception as e:
             logger.error(f"Error checking room and agent: {e}")
-            await lkapi.aclose()
             return False, []
+
+    def _on_room_fetched(self, room_name: str, started_at: float, fetch: asyncio.Future) -> None:
+        if fetch.cancelled() or fetch.exception() is not None:
+            if self._room_fetches.get(room_name) is fetch:
+                del self._room_fetches[room_name]
+            return
+        if self._room_fetches.get(room_name) is not fetch:
+            # invalidated by a webhook while in flight, the result may already be stale
+            return
+        del self._room_fetches[room_name]
+        self._room_cache[room_name] = (started_at, fetch.result())
+        if len(self._room_cache) > settings.ROOM_STATE_CACHE_MAX_ENTRIES:
+            cutoff = time.monotonic() - settings.ROOM_STATE_CACHE_TTL_SECONDS
+            self._room_cache = {name: entry for name, entry in self._room_cache.items() if entry[0] >= cutoff}
+            while len(self._room_cache) > settings.ROOM_STATE_CACHE_MAX_ENTRIES:
+                del self._room_cache[next(iter(self._room_cache))]
+
+    def invalidate_room(self, room_name: str) -> None:
+        """Drop cached state for a room, called when a LiveKit webhook reports a change."""
+        self._room_cache.pop(room_name, None)
+        # callers arriving from now on start a fresh fetch
+        self._room_fetches.pop(room_name, None)
+
+    async def _fetch_room_participants(self, room_name: str) -> tuple[bool, list[str]]:
+        # both lookups in one round trip time, participants are ignored if the room doesn't exist
+        rooms_response, participants_response = await asyncio.gather(
+            self.lkapi.room.list_rooms(api.ListRoomsRequest(names=[room_name])),
+            self.lkapi.room.list_participants(api.ListParticipantsRequest(room=room_name)),
+            return_exceptions=True
+        )
+        if isinstance(rooms_response, Exception):
+            raise rooms_response
+        if rooms_response is None or not rooms_response.rooms:
+            logger.info(f"Room '{room_name}' does not exist.")
+            return False, []
+
+        if isinstance(participants_response, Exception):
+            # the room can close between the two calls
+            logger.error(f"Error listing participants: {participants_response}")
+            return True, []
+        return True, [p.identity for p in participants_response.participants]
         
     async def create_token_with_agent_dispatch(self, room_name: str, agent_name: str, user_id: str):
+        """
+        Sign a join token whose room configuration dispatches the agent when the user's
+        join creates the room. Pure JWT signing, nothing connects to the room from here.
+        """
         try:
             # Check if room and agent already exist
             # room_exists, agent_registered = await self.check_room_and_agent(room_name, agent_name)
@@ -51,39 +132,63 @@ class LiveKitService:
             # if room_exists and agent_registered:
             #     logger.info(f"Agent '{agent_name}' already registered in room '{room_name}'")
             #     return True, self.generate_token(user_id, room_name)
-            token = (
-                api.AccessToken()
-                .with_identity(user_id)
-                .with_grants(api.VideoGrants(room_join=True, room=room_name))
-                .with_room_config(
-                    api.RoomConfiguration(
-                        agents=[api.RoomAgentDispatch(agent_name=agent_name, metadata="agent-{user_id}".format(user_id=user_id))],
-                    ),
-                )
-                .to_jwt()
-            )
-            roomJ = Room()
-            await roomJ.connect(settings.LIVEKIT_HOST, token)
+            token = self.issue_token(room_name, agent_name, user_id)
             return True, token
         except Exception as e:
             print(f"Error dispatching agent: {e}")
             return False, " "
-        
 
-    # async def dispatch_agent(self, room_name: str, agent_name: str, user_id: str) -> bool:
-    #     try:
-    #         service = api.AgentDispatchService(
-    #             settings.LIVEKIT_HOST,
-    #             settings.LIVEKIT_API_KEY,
-    #             settings.LIVEKIT_API_SECRET
-    #         )
-    #         req = protocol.CreateDispatchRequest(
-    #             room=room_name,
-    #             agent_name=agent_name,
-    #             metadata=f'{{"user_id": "{user_id}"}}'
-    #         )
-    #         await service.CreateDispatch(req)
-    #         return True
-    #     except Exception as e:
-    #         print(f"Error dispatching agent: {e}")
-    #         return False
\ No newline at end of file
+    def issue_token(self, room_name: str, agent_name: str, user_id: str) -> str:
+        """
+        Return a join token for the user, reusing a cached one until it is within
+        TOKEN_REFRESH_MARGIN_SECONDS of expiry. The grants are fully determined by the
+        room and agent, so (identity, room, agent) identifies the token.
+        """
+        key = (user_id, room_name, agent_name)
+        now = time.time()
+        cached = self._token_cache.get(key)
+        if cached is not None and cached[0] - settings.TOKEN_REFRESH_MARGIN_SECONDS > now:
+            return cached[1]
+
+        token = (
+            api.AccessToken(settings.LIVEKIT_API_KEY, settings.LIVEKIT_API_SECRET)
+            .with_identity(user_id)
+            .with_ttl(timedelta(seconds=settings.TOKEN_TTL_SECONDS))
+            .with_grants(api.VideoGrants(room_join=True, room=room_name))
+            .with_room_config(
+                api.RoomConfiguration(
+                    agents=[self._agent_dispatch(agent_name, user_id)],
+                ),
+            )
+            .to_jwt()
+        )
+        self._token_cache[key] = (now + settings.TOKEN_TTL_SECONDS, token)
+        if len(self._token_cache) > settings.TOKEN_CACHE_MAX_ENTRIES:
+            cutoff = now + settings.TOKEN_REFRESH_MARGIN_SECONDS
+            self._token_cache = {k: entry for k, entry in self._token_cache.items() if entry[0] > cutoff}
+            while len(self._token_cache) > settings.TOKEN_CACHE_MAX_ENTRIES:
+                del self._token_cache[next(iter(self._token_cache))]
+        return token
+
+    async def ensure_room(self, room_name: str, agent_name: str, user_id: str) -> bool:
+        """
+        Create the room ahead of the user's join through the server API, with the agent
+        dispatched on creation. CreateRoom returns an existing room unchanged, so calling
+        this for a live room does not dispatch a second agent.
+        """
+        try:
+            await self.lkapi.room.create_room(
+                api.CreateRoomRequest(
+                    name=room_name,
+                    agents=[self._agent_dispatch(agent_name, user_id)],
+                )
+            )
+            self.invalidate_room(room_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error creating room '{room_name}': {e}")
+            return False
+
+    @staticmethod
+    def _agent_dispatch(agent_name: str, user_id: str) -> api.RoomAgentDispatch:
+        return api.RoomAgentDispatch(agent_name=agent_name, metadata="agent-{user_id}".format(user_id=user_id))
@@ -19,7 +19,7 @@ def getAzureLLMIndexModel() -> AzureOpenAI:
     )
     return azure_llm
 
-def getAzureLLMIndexEmbeddingModel() -> AzureOpenAIEmbedding:
+def getAzureLLMIndexEmbeddingModel(embed_batch_size: int = 10, max_retries: int = 10) -> AzureOpenAIEmbedding:
     """
     Get the Azure OpenAI embedding model for vector store indexing.
     """
@@ -32,5 +32,7 @@ def getAzureLLMIndexEmbeddingModel() -> AzureOpenAIEmbedding:
         azure_endpoint=settings.INFERENCE_API_ENDPOINT,
         api_key=settings.INFERENCE_API_KEY,
         api_version="2023-05-15",
+        embed_batch_size=embed_batch_size,
+        max_retries=max_retries,
     )
     return embed_model
\ No newline at end of file